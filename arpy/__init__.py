@@ -3,13 +3,16 @@
 
 __version__ = "0.3.7"
 
+import os
 import types
 from copy import copy
 from ctypes import c_int, py_object, pythonapi
+from importlib import import_module
 from sys import _getframe
 
+from .algebra.budget import Budget, BudgetExceeded
 from .algebra.data_types import Alpha, MultiVector, Term, Xi
-from .algebra.differential import AR_differential
+from .algebra.differential import AR_differential, CompoundDifferential
 from .algebra.operations import (
     MM_bar,
     commutator,
@@ -23,14 +26,11 @@ from .algebra.operations import (
     hermitian,
     inverse,
     project,
+    projected_full,
     rev,
 )
-from .config import ARConfig, config
-from .consts import Orientation, Zet, ZetElements
-from .reductions.del_grouping import del_grouped
-from .utils.lexparse import ARContext
+from .config import PREDEFINED, ARConfig, config
 from .utils.utils import power_notation, reorder_allowed
-from .utils.visualisation import cayley, js_cayley, op_block, sign_cayley, sign_distribution
 
 
 ##############################################################################
@@ -49,24 +49,12 @@ def invert_multivector(self):
 MultiVector.__invert__ = invert_multivector
 
 
-def update_env(self, lvl=2):
-    """Update the list of predefined operators and multivectors"""
-
-    def _bind_to_calling_scope(defs, lvl):
-        """
-        Inject the default Multivectors and operators into the main scope
-        of the repl. (THIS IS HORRIFYING!!!)
-        NOTE: This uses some not-so-nice abuse of stack frames and the
-              ctypes API to make this work and as such it will almost
-              certainly not run under anything other than cPython.
-        """
-        # Grab the stack frame that the caller's code is running in
-        frame = _getframe(lvl)
-        # Dump the matched variables and their values into the frame
-        frame.f_locals.update(defs)
-        # Force an update of the frame locals from the locals dict
-        pythonapi.PyFrame_LocalsToFast(py_object(frame), c_int(0))
-
+def build_env(self):
+    """
+    Create the predefined operators and multivectors for this config,
+    returning them by name. This happens automatically the first time that
+    any of them are used.
+    """
     # Multi-vectors to work with based on the 3-vectors
     self.p = MultiVector("p", cfg=self)
     self.h = MultiVector(self._h, cfg=self)
@@ -98,50 +86,81 @@ def update_env(self, lvl=2):
     self.DA = AR_differential(self.zet_A, cfg=self)
     self.DE = AR_differential(self.zet_E, cfg=self)
 
-    _vars = [
-        "p",
-        "h",
-        "q",
-        "t",
-        "A",
-        "B",
-        "E",
-        "F",
-        "T",
-        "G",
-        "zet_B",
-        "zet_T",
-        "zet_A",
-        "zet_E",
-        "Fp",
-        "zet_F",
-        "Dmu",
-        "d",
-        "DG",
-        "DF",
-        "DB",
-        "DT",
-        "DA",
-        "DE",
-    ]
-    defs = dict(zip(_vars, (getattr(self, var) for var in _vars)))
-    _bind_to_calling_scope(defs, lvl)
+    return {var: self.__dict__[var] for var in PREDEFINED}
+
+
+def update_env(self, lvl=2):
+    """Update the list of predefined operators and multivectors"""
+
+    def _bind_to_calling_scope(defs, lvl):
+        """
+        Inject the default Multivectors and operators into the main scope
+        of the repl. (THIS IS HORRIFYING!!!)
+        NOTE: This uses some not-so-nice abuse of stack frames and the
+              ctypes API to make this work and as such it will almost
+              certainly not run under anything other than cPython.
+        """
+        # Grab the stack frame that the caller's code is running in
+        frame = _getframe(lvl)
+        # Dump the matched variables and their values into the frame
+        frame.f_locals.update(defs)
+        # Force an update of the frame locals from the locals dict
+        pythonapi.PyFrame_LocalsToFast(py_object(frame), c_int(0))
+
+    _bind_to_calling_scope(self.build_env(), lvl)
 
 
 # Add the update_env method to ARConfig _and_ the config instance
+ARConfig.build_env = build_env
 ARConfig.update_env = update_env
 config.update_env = types.MethodType(update_env, config)
 
 ##############################################################################
 
-# Bring the config definitions into scope
+# Load precomputed Cayley tables if the user has an atlas set up
+if os.environ.get("ARPY_CAYLEY_ATLAS"):
+    from .algebra.atlas import use_atlas
+
+    use_atlas(os.environ["ARPY_CAYLEY_ATLAS"])
+
 config.update_config()
-config.update_env()
 
-# Build the default context for computation
-# NOTE:: The user can create a new context in the same way or modify the
-#        properties of the original context using .metric and .division
-ar = ARContext(cfg=config)
+# Names that are only imported (or built) when they are first used so that
+# importing arpy stays fast: see __getattr__ below.
+_lazy_imports = {
+    ".algebra.atlas": ["CayleyAtlas", "use_atlas"],
+    ".consts": ["Orientation", "Zet", "ZetElements"],
+    ".reductions.del_grouping": ["del_grouped"],
+    ".utils.lexparse": ["ARContext"],
+    ".utils.memory": ["profile_memory"],
+    ".utils.stats": ["stats"],
+    ".utils.trace": ["trace"],
+    ".utils.visualisation": ["cayley", "js_cayley", "op_block", "sign_cayley", "sign_distribution"],
+}
+_lazy_modules = {name: module for module, names in _lazy_imports.items() for name in names}
+
+
+def __getattr__(name):
+    if name in _lazy_modules:
+        value = getattr(import_module(_lazy_modules[name], __name__), name)
+    elif name in PREDEFINED:
+        value = getattr(config, name)
+    elif name == "ar":
+        # The default context for computation
+        # NOTE:: The user can create a new context in the same way or modify the
+        #        properties of the original context using .metric and .division
+        from .utils.lexparse import ARContext
+
+        value = ARContext(cfg=config)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_modules) | set(PREDEFINED) | {"ar"})
 
 
 def arpy_info():
@@ -168,6 +187,7 @@ __all__ = [
     "div_by",
     "div_into",
     "project",
+    "projected_full",
     "dagger",
     "hermitian",
     "commutator",
@@ -186,6 +206,7 @@ __all__ = [
     "DE",
     # Differential operator helpers
     "AR_differential",
+    "CompoundDifferential",
     "del_grouped",
     # Visulaisation functions
     "cayley",
@@ -212,6 +233,13 @@ __all__ = [
     "config",
     "ARConfig",
     "ARContext",
+    "CayleyAtlas",
+    "use_atlas",
+    "Budget",
+    "BudgetExceeded",
+    "stats",
+    "trace",
+    "profile_memory",
     "Zet",
     "ZetElements",
     "Orientation",
@@ -1,15 +1,21 @@
 """
 Attempt at making this work:
 
-    $ python3 -m arpy <calculation_file> [--vector --simplify --latex]
+    $ python3 -m arpy <calculation_file> [--vector --simplify --latex --watch]
 
 The file is fed through and ARContext with some aditional pre-parsing in
 order to deal with assignment and paramater setting. All Variables are printed
 when at the head of the output and calculations are labelled.
 """
 import argparse
+import os
+import sys
+import time
+import traceback
+from contextlib import ExitStack
 
-from .utils.calc_file import run_calculation
+from .utils import daemon
+from .utils.calc_file import StepCache, run_script
 
 description = """\
 .: arpy :: Absolute Relativity and the Algebra of Reality :.
@@ -37,12 +43,48 @@ FDF = F ^ DF
 FFdag = F ^ F!
 ```
 
-Lines begining "//" set paramaters for the calculation. At present the only
-permitted values are "ALLOWED" and "METRIC" as in the example.
+Lines begining "//" set paramaters for the calculation: "ALLOWED" and "METRIC"
+as in the example or "DIVISION" (either "by" or "into").
+
+A calculation can be compared across several configurations using SWEEP:
+
+```
+// SWEEP: METRIC +--- -+++
+// SWEEP: DIVISION by into
+// SWEEP: ALLOWED p 23 31 12 ... | p 1 2 3 ...
+```
+
+The calculation is run for every combination of the swept values (in parallel
+when using --jobs) and results that differ are shown side by side.
 
 Lines begining "#" are calculation comments and will be printed as given.
 
 Assigning a result to a name will compute a result and display it.
+
+Using "--format jsonl" writes one JSON object per step instead of formatted
+text: the line number, name, expression, config and timing of the step along
+with its value as a list of terms ("alpha", "sign", "xis" and "partials").
+"--format binary" writes the same information in the compact binary format
+described in arpy/utils/serialise.py which is better suited to large results.
+
+Running "python -m arpy --serve" starts a daemon that keeps arpy loaded (along
+with its caches) so that "python -m arpy --daemon <file>" can run calculations
+without paying for arpy to start up each time. If the daemon is not running
+then --daemon runs the calculation as normal.
+
+Using "--stats" prints the number of calls to (and the time spent in) each
+operation and expression once the calculation has finished, along with the hit
+rate of the product cache and the number of values created. Steps run by
+worker processes (when using --jobs) are not counted. "--trace out.json"
+records a span for each step, expression, syntax tree node and differential
+that can be viewed in chrome://tracing or https://ui.perfetto.dev. "--memory"
+prints the memory allocated by each step and operation, the number of Alphas,
+Xis, Terms and MultiVectors that each created and where the allocations of
+each step came from.
+
+Results are cached in memory so that "--watch" only recomputes the steps that
+were affected by each edit. Pass "--cache-dir DIR" (or set $ARPY_CACHE_DIR) to
+also keep results on disk so that later runs can re-use them.
 """
 
 
@@ -62,12 +104,66 @@ parser.add_argument(
 parser.add_argument(
     "-l", "--latex", action="store_true", help="print results as LaTex instead of unicode"
 )
-parser.add_argument("script")
+parser.add_argument(
+    "-w", "--watch", action="store_true", help="re-run the calculation each time the file is saved"
+)
+parser.add_argument(
+    "-j", "--jobs", type=int, default=1, help="evaluate independent steps using N processes"
+)
+parser.add_argument(
+    "-t", "--timings", action="store_true", help="show the time taken and size of each result"
+)
+parser.add_argument(
+    "-f",
+    "--format",
+    choices=["text", "jsonl", "binary"],
+    default="text",
+    help="write formatted text (the default) or structured results for other programs",
+)
+parser.add_argument(
+    "--cache-dir",
+    default=os.environ.get("ARPY_CACHE_DIR"),
+    help="directory to cache the results of each step in",
+)
+parser.add_argument("--no-cache", action="store_true", help="recompute every step")
+parser.add_argument(
+    "--serve", action="store_true", help="start a daemon to run calculations for other invocations"
+)
+parser.add_argument(
+    "-d", "--daemon", action="store_true", help="run the calculation using a running daemon"
+)
+parser.add_argument("--socket", help="the socket for the daemon (default: $ARPY_SOCKET)")
+parser.add_argument(
+    "-s",
+    "--stats",
+    action="store_true",
+    help="print the calls to and time taken by each operation (runs the calculation locally)",
+)
+parser.add_argument(
+    "--trace",
+    metavar="FILE",
+    help="write a Chrome trace of the calculation to FILE (runs the calculation locally)",
+)
+parser.add_argument(
+    "--memory",
+    action="store_true",
+    help="print the memory used by each step and operation (runs the calculation locally)",
+)
+parser.add_argument("script", nargs="?")
 args = parser.parse_args()
 
-# Read in the contents of the script
-with open(args.script, "r") as f:
-    script = [s.strip() for s in f.readlines() if s != "\n"]
+
+def read_script(path):
+    with open(path, "r") as f:
+        return [s.strip() for s in f.readlines() if s != "\n"]
+
+
+def modified_time(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None  # Editors may briefly remove the file while saving
+
 
 modifier = ""
 
@@ -77,6 +173,110 @@ if args.vector:
 if args.latex:
     modifier += ".__tex__()"
 
+cache = None if args.no_cache else StepCache(args.cache_dir)
+
+
+def write(output):
+    if isinstance(output, bytes):
+        sys.stdout.buffer.write(output)
+        sys.stdout.buffer.flush()
+    else:
+        print(output, flush=True)
+
+
+def run_with_daemon(sock, script):
+    """Hand the script to a running daemon and write out what it sends back"""
+    options = dict(
+        modifier=modifier,
+        cache_dir=None if cache is None else cache.path,
+        jobs=args.jobs,
+        timings=args.timings,
+        format=args.format,
+    )
+
+    for kind, payload in daemon.request(sock, script, **options):
+        if kind == daemon.STDOUT:
+            sys.stdout.buffer.write(payload)
+            sys.stdout.buffer.flush()
+        elif kind == daemon.STDERR:
+            sys.stderr.write(payload.decode("utf8"))
+        elif payload != b"\x00":
+            raise RuntimeError("The calculation failed in the arpy daemon")
+
+
+def instrumentation():
+    """
+    Turn on the stats, trace and memory profile requested on the command line,
+    returning the ExitStack that turns them off and the reports to print.
+    """
+    # These are only imported when used to keep starting the CLI fast
+    stack, reports = ExitStack(), []
+
+    if args.stats:
+        from .utils.stats import stats
+
+        stats.reset()
+        reports.append(stack.enter_context(stats).report)
+
+    if args.trace:
+        from .utils.trace import Trace
+
+        stack.enter_context(Trace(args.trace))
+
+    if args.memory:
+        from .utils.memory import MemoryProfile
+
+        reports.append(stack.enter_context(MemoryProfile()).report)
+
+    return stack, reports
+
+
+def run(path):
+    """Print the output of each step as soon as it has been computed"""
+    script = read_script(path)
+
+    if args.daemon and not (args.stats or args.trace or args.memory):
+        try:
+            sock = daemon.connect(args.socket)
+        except OSError:
+            print("Unable to connect to the arpy daemon: running locally", file=sys.stderr)
+        else:
+            return run_with_daemon(sock, script)
+
+    instruments, reports = instrumentation()
+    with instruments:
+        for output in run_script(script, modifier, cache, args.jobs, args.timings, args.format):
+            write(output)
+
+    for report in reports:
+        print(report(), file=sys.stderr)
+
+
+if args.serve:
+    try:
+        daemon.serve(args.socket)
+    except daemon.AlreadyRunning as e:
+        parser.exit(1, "{}\n".format(e))
+    sys.exit()
+
+if args.script is None:
+    parser.error("a calculation file is required")
+
+last_modified = modified_time(args.script)
+run(args.script)
+
+while args.watch:
+    try:
+        time.sleep(0.5)
+        modified = modified_time(args.script)
+        if modified is None or modified == last_modified:
+            continue
 
-output = run_calculation(script, modifier)
-print("\n".join(output))
+        last_modified = modified
+        print("\n" + "=" * 78 + "\n")
+        run(args.script)
+    except KeyboardInterrupt:
+        break
+    except Exception:
+        # Keep watching: the next save will hopefully fix things
+        traceback.print_exc()
@@ -0,0 +1,286 @@
+"""
+A persisted atlas of precomputed Cayley tables.
+
+Computing the full Cayley table for a given (metric, allowed) pair is cheap
+but not free, and every new process (sweep workers, visualisations, the CLI)
+has to pay for it again before find_prod's in-memory cache is warm. The atlas
+stores each table that has ever been computed in a single compact binary
+file that is memory mapped on open so that subsequent processes can load the
+whole table in one go.
+
+NOTE:: Division only changes which of αμ^-1 αν or αμ αν^-1 we form, and the
+       inverse of an Alpha is given by the diagonal of the product table. This
+       means that a single table per (metric, allowed) pair is enough to serve
+       every (metric, allowed, division) combination.
+
+File layout (all integers are little endian)
+============================================
+    header   | magic (8 bytes) | n_slots (u32) | n_entries (u32) |
+    index    | n_slots * [ key digest (16 bytes) | table offset (u64) ] |
+    tables   | n_entries * 256 bytes |
+
+The index is an open addressed hash table keyed on a digest of the config.
+Each table is a row major 16x16 grid of bytes where the low nibble is the
+position of the product in `allowed` and the high bit is set if the product
+is negative. Missing tables are computed on first use and appended to the
+file, doubling the size of the index when it becomes three quarters full.
+"""
+import mmap
+import os
+import struct
+from hashlib import blake2b
+
+from .data_types import Alpha
+from .operations import find_prod
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (not available on windows)
+    fcntl = None
+
+MAGIC = b"ARPYCAY1"
+HEADER = struct.Struct("<8sII")
+SLOT = struct.Struct("<16sQ")
+TABLE_SIZE = 256
+NEGATIVE = 0x80
+INITIAL_SLOTS = 64
+
+
+def config_key(cfg):
+    """The parts of a config that determine its Cayley table"""
+    return (tuple(cfg.metric), tuple(cfg.allowed))
+
+
+def _digest(key):
+    return blake2b(repr(key).encode(), digest_size=16).digest()
+
+
+def compute_table(cfg):
+    """Compute the encoded Cayley table for a config without touching any caches"""
+    allowed = list(cfg.allowed)
+    positions = {a: n for n, a in enumerate(allowed)}
+    table = bytearray(TABLE_SIZE)
+
+    for r, i in enumerate(allowed):
+        for c, j in enumerate(allowed):
+            prod = find_prod.__wrapped__(Alpha(i, cfg=cfg), Alpha(j, cfg=cfg), cfg=cfg)
+            table[16 * r + c] = positions[prod._index] | (NEGATIVE if prod._sign == -1 else 0)
+
+    return bytes(table)
+
+
+def decode(table, allowed, r, c):
+    """Return the (index, sign) of the product of the r'th and c'th elements of allowed"""
+    byte = table[16 * r + c]
+    return allowed[byte & 0x0F], (-1 if byte & NEGATIVE else 1)
+
+
+class CayleyAtlas:
+    """
+    A file backed collection of Cayley tables. Lookups are served from a read
+    only memory map of the file and new tables are appended under an exclusive
+    lock so that several processes are able to share a single atlas.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self._tables = {}
+        self._warmed = set()
+        self._map = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Another process may have just created the file: it holds the lock
+        # until the header has been written so only check for one under it.
+        with open(self.path, "ab") as f:
+            self._locked(f, lambda: os.fstat(f.fileno()).st_size == 0 and self._initialise(f))
+
+        self._remap()
+
+    def __len__(self):
+        return HEADER.unpack_from(self._map, 0)[2] if self._map else 0
+
+    def __repr__(self):
+        return f"CayleyAtlas({self.path!r}, entries={len(self)})"
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def table(self, cfg):
+        """Fetch the encoded Cayley table for cfg, computing and storing it if needed"""
+        key = config_key(cfg)
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+
+        digest = _digest(key)
+        table = self._lookup(digest)
+
+        if table is None:
+            # Another process may have added the table since we last mapped the file
+            self._remap()
+            table = self._lookup(digest)
+
+        if table is None:
+            table = compute_table(cfg)
+            self._append(digest, table)
+
+        self._tables[key] = table
+        return table
+
+    def product(self, i, j, cfg):
+        """Look up the product of two Alpha indices as an (index, sign) pair"""
+        allowed = list(cfg.allowed)
+        return decode(self.table(cfg), allowed, allowed.index(i), allowed.index(j))
+
+    def warm(self, cfg):
+        """
+        Populate find_prod's cache with every product for cfg. Returns False if
+        the cache has already been warmed for this config.
+        """
+        key = config_key(cfg)
+        if key in self._warmed:
+            return False
+
+        table = self.table(cfg)
+        allowed = list(cfg.allowed)
+        metric, _allowed = key
+        cache = find_prod.cache
+
+        for r, i in enumerate(allowed):
+            for c, j in enumerate(allowed):
+                index, sign = decode(table, allowed, r, c)
+                for si in [1, -1]:
+                    for sj in [1, -1]:
+                        args = (Alpha(i, si, cfg=cfg), Alpha(j, sj, cfg=cfg), metric, _allowed)
+                        cache[args] = Alpha(index, sign * si * sj, cfg=cfg)
+
+        self._warmed.add(key)
+        return True
+
+    # ================================================= #
+    # Low level file handling: only touch with the lock #
+    # ================================================= #
+
+    def _remap(self):
+        self.close()
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, _, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a Cayley table atlas")
+
+    def _slots(self, data):
+        _, n_slots, _ = HEADER.unpack_from(data, 0)
+        for n in range(n_slots):
+            yield n, SLOT.unpack_from(data, HEADER.size + n * SLOT.size)
+
+    def _probe(self, data, digest):
+        """Find the slot for digest: either the matching slot or the first empty one"""
+        _, n_slots, _ = HEADER.unpack_from(data, 0)
+        start = int.from_bytes(digest[:8], "little") % n_slots
+
+        for step in range(n_slots):
+            n = (start + step) % n_slots
+            key, offset = SLOT.unpack_from(data, HEADER.size + n * SLOT.size)
+            if offset == 0 or key == digest:
+                return n, offset
+
+        return None, 0
+
+    def _lookup(self, digest):
+        _, offset = self._probe(self._map, digest)
+        if offset == 0:
+            return None
+        return bytes(self._map[offset : offset + TABLE_SIZE])
+
+    def _locked(self, f, action):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            return action()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _initialise(self, f, n_slots=INITIAL_SLOTS, tables=()):
+        f.seek(0)
+        f.truncate()
+        f.write(HEADER.pack(MAGIC, n_slots, 0))
+        f.write(b"\x00" * (n_slots * SLOT.size))
+        f.flush()
+
+        for digest, table in tables:
+            self._write_entry(f, digest, table)
+
+    def _write_entry(self, f, digest, table):
+        f.seek(0)
+        data = f.read()
+        _, n_slots, n_entries = HEADER.unpack_from(data, 0)
+        n, offset = self._probe(data, digest)
+
+        if offset != 0:
+            return  # Someone else got there first
+
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(table)
+        f.seek(HEADER.size + n * SLOT.size)
+        f.write(SLOT.pack(digest, offset))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, n_slots, n_entries + 1))
+        f.flush()
+
+    def _append(self, digest, table):
+        while True:
+            with open(self.path, "r+b") as f:
+                if self._locked(f, lambda: self._append_locked(f, digest, table)):
+                    break
+
+        self._remap()
+
+    def _append_locked(self, f, digest, table):
+        if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+            return False  # The file was rebuilt while we were waiting for the lock
+
+        f.seek(0)
+        data = f.read()
+        _, n_slots, n_entries = HEADER.unpack_from(data, 0)
+
+        if 4 * (n_entries + 1) <= 3 * n_slots:
+            self._write_entry(f, digest, table)
+            return True
+
+        # Rebuild with a larger index in a new file so that readers who have the
+        # current file mapped are never left looking at a truncated file.
+        existing = [
+            (key, data[offset : offset + TABLE_SIZE])
+            for _, (key, offset) in self._slots(data)
+            if offset != 0
+        ]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w+b") as new:
+            self._initialise(new, 2 * n_slots, existing + [(digest, table)])
+        os.replace(tmp, self.path)
+        return True
+
+
+def use_atlas(path):
+    """
+    Load (or create) the atlas at `path` and use it to fill find_prod's cache
+    with whole Cayley tables the first time each config is seen.
+    """
+    atlas = CayleyAtlas(path)
+    find_prod.loader = atlas.warm
+    return atlas
+
+
+def clear_atlas():
+    """Stop loading Cayley tables from an atlas"""
+    find_prod.loader = None
@@ -0,0 +1,146 @@
+"""
+Limits on the size and duration of computations.
+
+Products of large MultiVectors (and repeated differentials of them) grow
+multiplicatively so an innocent looking expression such as `G ^ G ^ G` can
+run for minutes or exhaust the available memory. A Budget places limits on
+a computation that are checked as it runs:
+
+    max_terms   : the largest number of terms that any single product or
+                  differential may produce (checked before the result is
+                  built so that nothing is allocated).
+    max_seconds : the total wall time allowed for the computation.
+    progress    : a callback that is given the number of terms produced so
+                  far and the elapsed time after each product.
+
+Budgets can also be cancelled from another thread using `cancel`. When a
+limit is hit (or the budget is cancelled) a BudgetExceeded error is raised.
+
+>>> with Budget(max_terms=10_000, max_seconds=5).active():
+...     full(G, full(G, G))
+
+full, differential operators and ARContext all accept a `budget` keyword
+argument that does the same thing. Checks are only made while a budget is
+active. Otherwise the only cost is looking for the `budget` argument, which
+is done once per call of full on MultiVectors rather than once per pair of
+terms.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+
+class BudgetExceeded(Exception):
+    """A computation went over one of the limits set by its Budget"""
+
+
+class Cancelled(BudgetExceeded):
+    """A computation was stopped by calling Budget.cancel"""
+
+
+# The usage of the budget for the computation currently being run (if any)
+_usage = ContextVar("arpy_budget_usage", default=None)
+
+
+class Budget:
+    """Limits for a computation: see the module docstring for details"""
+
+    def __init__(self, max_terms=None, max_seconds=None, progress=None):
+        self.max_terms = max_terms
+        self.max_seconds = max_seconds
+        self.progress = progress
+        self._cancelled = False
+        self._parent = None
+
+    def __repr__(self):
+        return "Budget(max_terms={}, max_seconds={})".format(self.max_terms, self.max_seconds)
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self._parent is not None and self._parent.cancelled)
+
+    def cancel(self):
+        """Stop any computation using this budget (or one derived from it)"""
+        self._cancelled = True
+
+    def child(self):
+        """
+        A budget with the same limits that is cancelled along with this one
+        but that can also be cancelled on its own.
+        """
+        child = Budget(self.max_terms, self.max_seconds, self.progress)
+        child._parent = self
+        return child
+
+    @contextmanager
+    def active(self):
+        """Apply this budget to everything computed inside of the with block"""
+        token = _usage.set(_Usage(self))
+        try:
+            yield self
+        finally:
+            _usage.reset(token)
+
+
+class _Usage:
+    """The resources consumed so far by one run of a computation under a Budget"""
+
+    __slots__ = ["budget", "started", "terms"]
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.terms = 0
+
+    def check(self):
+        budget = self.budget
+        if budget.cancelled:
+            raise Cancelled("Computation cancelled")
+
+        if budget.max_seconds is not None:
+            elapsed = time.monotonic() - self.started
+            if elapsed > budget.max_seconds:
+                raise BudgetExceeded(
+                    "Computation took longer than {}s ({:.2f}s)".format(budget.max_seconds, elapsed)
+                )
+
+    def reserve(self, n_terms):
+        self.check()
+        budget = self.budget
+
+        if budget.max_terms is not None and n_terms > budget.max_terms:
+            raise BudgetExceeded(
+                "Result would contain {} terms (limit is {})".format(n_terms, budget.max_terms)
+            )
+
+        self.terms += n_terms
+        if budget.progress is not None:
+            budget.progress(self.terms, time.monotonic() - self.started)
+
+
+def reserve(n_terms):
+    """
+    Declare that a computation is about to produce `n_terms` terms, raising
+    BudgetExceeded if that is not allowed. Returns the usage of the active
+    budget so that long loops can call `check` as they go, or None if there
+    is no active budget.
+    """
+    usage = _usage.get()
+    if usage is not None:
+        usage.reserve(n_terms)
+    return usage
+
+
+def budgeted(func):
+    """Allow a function to be passed a `budget` keyword argument to run under"""
+
+    @wraps(func)
+    def wrapped(*args, budget=None, **kwargs):
+        if budget is None:
+            return func(*args, **kwargs)
+
+        with budget.active():
+            return func(*args, **kwargs)
+
+    return wrapped
@@ -54,7 +54,8 @@ class MultiVector:
         if not isinstance(other, MultiVector):
             return False
 
-        return sorted(self._terms) == sorted(other._terms)
+        # Terms that only differ in sign sort as equal so compare as multisets
+        return Counter(self._terms) == Counter(other._terms)
 
     def __len__(self):
         return len(self._terms)
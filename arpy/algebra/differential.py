@@ -10,12 +10,13 @@ Absolute Relativity and should only operate on MultiVectors.
 
 NOTE:: Specific operators (such as Dmu) are defined in the __init__ file.
 """
-from copy import deepcopy
+from copy import copy
 
 from ..config import config as cfg
-from ..utils.utils import SUB_SCRIPTS
+from ..utils.utils import SUB_SCRIPTS, power_notation
+from .budget import budgeted, reserve
 from .data_types import Alpha, MultiVector
-from .operations import div_by, div_into, full, inverse
+from .operations import div_by, div_into, find_prod, full, inverse
 
 
 class AR_differential:
@@ -38,26 +39,61 @@ class AR_differential:
             self.wrt = [Alpha(comp, cfg=cfg) for comp in wrt]
 
         self.cfg = cfg
+        self._tables = {}
 
         alphas = ", ".join([str(a) for a in self.wrt])
         self.__doc__ = "Differnetiate with respect to: {}".format(alphas)
 
+    @budgeted
     def __call__(self, mvec, cfg=None, div=None):
         """
         Compute the result of Differentiating a each component of a MultiVector
         with respect to a given list of unit elements under the algebra.
+        Pass `budget=Budget(...)` to limit the size and run time.
         """
         comps = []
         if cfg is None:
             cfg = self.cfg
 
+        table = self.division_table(cfg, div)
+        deps = cfg.xi_dependencies
+        usage = reserve(len(mvec) * len(self.wrt))
+
         for term in mvec:
-            for element in self.wrt:
-                result = term_partial(term, element, cfg, div)
-                comps.append(result)
+            if usage is not None:
+                usage.check()
+            row = table[term._alpha._index]
+            for element, (index, sign) in zip(self.wrt, row):
+                if deps and vanishes(term, [element], deps):
+                    continue
+                comps.append(_with_partials(term, [element], Alpha(index, cfg=cfg), sign))
 
         return MultiVector(comps, cfg=cfg)
 
+    def division_table(self, cfg, div=None):
+        """
+        The (term alpha, wrt alpha) -> (result alpha, sign) mapping for this
+        operator is fixed for a given config and division type so we compute
+        it once and then look up rows of the table by the index of each term.
+        Each row contains the (index, sign) pairs for every element of wrt.
+        """
+        div = div if div else cfg.division_type
+        key = (tuple(cfg.metric), tuple(cfg.allowed), div)
+        table = self._tables.get(key)
+
+        if table is None:
+            table = {}
+            for index in cfg.allowed:
+                row = []
+                for element in self.wrt:
+                    alpha = _div(Alpha(index, cfg=cfg), element, cfg, div)
+                    row.append((alpha._index, alpha._sign))
+                table[index] = row
+
+            self._tables[key] = table
+
+        return table
+
     def __repr__(self):
         elements = [
             "{}∂{}".format(str(inverse(a, cfg=self.cfg)), "".join(SUB_SCRIPTS[i] for i in a._index))
@@ -87,22 +123,211 @@ def _div(alpha, wrt, cfg, div=None):
         raise ValueError("Invalid division specification: {}".format(cfg.division_type))
 
 
-def term_partial(term, wrt, cfg, div):
+def vanishes(term, partials, deps):
     """
-    Symbolically differentiate a term by storing the partials and
-    converting the alpha value using the correct division type.
+    Check whether differentiating term wrt each of partials is identically
+    zero given the declared Xi dependencies (see ARConfig.xi_dependencies).
+    For products of Xis, a partial only vanishes if none of the Xis depend
+    on it. Undeclared Xis depend on everything.
     """
-    new_term = deepcopy(term)
-    new_term.alpha = _div(new_term.alpha, wrt, cfg, div)
+    for p in partials:
+        if all(c._val in deps and p._index not in deps[c._val] for c in term._components):
+            return True
+
+    return False
+
+
+def _with_partials(term, partials, alpha, sign):
+    """
+    Build a new Term from `term` with `partials` attached and the (unsigned)
+    alpha replaced. `sign` is the sign picked up by the division(s).
+    The Xi components are copied (rather than deep copied) as the partials
+    setters always bind new lists.
+    """
+    new_term = copy(term)
+    new_term._alpha = alpha
+    new_term._sign = term._sign * sign
+    new_term._components = [copy(c) for c in term._components]
 
     if len(new_term._components) == 1:
-        new_term._components[0].partials = [wrt] + new_term._components[0]._partials
+        new_term._components[0].partials = partials + new_term._components[0]._partials
     else:
-        new_term.component_partials = [wrt] + new_term._component_partials
+        new_term.component_partials = partials + new_term._component_partials
 
     return new_term
 
 
+def term_partial(term, wrt, cfg, div):
+    """
+    Symbolically differentiate a term by storing the partials and
+    converting the alpha value using the correct division type.
+    """
+    alpha = _div(term.alpha, wrt, cfg, div)
+    return _with_partials(term, [wrt], Alpha(alpha._index, cfg=cfg), alpha._sign)
+
+
+class CompoundDifferential:
+    """
+    The composition of two or more differential operators: `Dmu ^ Dmu` etc.
+
+    Rather than expanding the operand once per operator, the compound
+    operator multiplies out the operators themselves. Partials commute so
+    each combination of wrt elements is stored with its partials in canonical
+    (sorted) order, allowing like terms to be merged and cancelled before
+    anything is applied. For example, the mixed partials in Dmu ^ Dmu cancel
+    leaving only the d'Alembertian.
+
+    Applying a compound operator D1 ^ D2 to M from the left is the same as
+    D1(D2(M)) and applying it from the right is the same as (M D1) D2.
+    """
+
+    def __init__(self, operators, cfg=cfg):
+        self.operators = []
+        for op in operators:
+            if isinstance(op, CompoundDifferential):
+                self.operators.extend(op.operators)
+            elif isinstance(op, AR_differential):
+                self.operators.append(op)
+            else:
+                raise ValueError("Can only compose differential operators")
+
+        self.cfg = cfg
+        self._terms = {}
+        self._tables = {}
+
+    def __len__(self):
+        return sum(count for _, _, count in self.terms(self.cfg, "into"))
+
+    def terms(self, cfg, div):
+        """
+        The merged (partials, multiplier, count) triples for this operator when
+        applied from the left. Under division 'into' the multiplier left
+        multiplies each term and under division 'by' it right multiplies.
+        """
+        key = (tuple(cfg.metric), tuple(cfg.allowed), div)
+        terms = self._terms.get(key)
+        if terms is not None:
+            return terms
+
+        # Start with the identity and multiply in each operator from the left
+        merged = {(): {"p": 1}}
+        for op in self.operators:
+            step = {}
+            for partials, multipliers in merged.items():
+                for wrt in op.wrt:
+                    inv = inverse(wrt, cfg=cfg)
+                    counts = step.setdefault(tuple(sorted(partials + (wrt,))), {})
+
+                    for index, count in multipliers.items():
+                        current = Alpha(index, cfg=cfg)
+                        if div == "into":
+                            alpha = find_prod(current, inv, cfg=cfg)
+                        else:
+                            alpha = find_prod(inv, current, cfg=cfg)
+                        counts[alpha._index] = counts.get(alpha._index, 0) + count * alpha._sign
+
+            merged = step
+
+        terms = [
+            (list(partials), Alpha(index, 1 if count > 0 else -1, cfg=cfg), abs(count))
+            for partials, counts in merged.items()
+            for index, count in counts.items()
+            if count != 0
+        ]
+        self._terms[key] = terms
+        return terms
+
+    @budgeted
+    def __call__(self, mvec, cfg=None, div=None):
+        """Apply the compound operator to each term of a MultiVector"""
+        if cfg is None:
+            cfg = self.cfg
+
+        div = div if div else cfg.division_type
+        terms = self.terms(cfg, div)
+        table = self._table(cfg, div, terms)
+        deps = cfg.xi_dependencies
+        comps = []
+        usage = reserve(len(mvec) * sum(count for _, _, count in terms))
+
+        for term in mvec:
+            if usage is not None:
+                usage.check()
+            row = table[term._alpha._index]
+            for (partials, _, count), (index, sign) in zip(terms, row):
+                if deps and vanishes(term, partials, deps):
+                    continue
+                for _ in range(count):
+                    comps.append(_with_partials(term, partials, Alpha(index, cfg=cfg), sign))
+
+        return MultiVector(comps, cfg=cfg)
+
+    def _table(self, cfg, div, terms):
+        key = (tuple(cfg.metric), tuple(cfg.allowed), div)
+        table = self._tables.get(key)
+
+        if table is None:
+            table = {}
+            for index in cfg.allowed:
+                row = []
+                for _, multiplier, _ in terms:
+                    alpha = Alpha(index, cfg=cfg)
+                    if div == "into":
+                        res = find_prod(multiplier, alpha, cfg=cfg)
+                    else:
+                        res = find_prod(alpha, multiplier, cfg=cfg)
+                    row.append((res._index, res._sign))
+                table[index] = row
+
+            self._tables[key] = table
+
+        return table
+
+    def reversed(self):
+        """The same operators composed in the opposite order"""
+        return compose(*reversed(self.operators), cfg=self.cfg)
+
+    def __repr__(self):
+        elements = []
+        for partials, multiplier, count in self.terms(self.cfg, "into"):
+            ds = "".join(
+                power_notation(["∂" + "".join(SUB_SCRIPTS[i] for i in p._index) for p in partials])
+            )
+            elements.extend([f"{multiplier}{ds}"] * count)
+
+        return "{ " + " ".join(elements) + " }"
+
+    def __tex__(self):
+        elements = []
+        for partials, multiplier, count in self.terms(self.cfg, "into"):
+            sign = "" if multiplier._sign == 1 else "-"
+            ds = "".join("\\partial_{%s}" % p._index for p in partials)
+            elements.extend(["%s\\alpha_{%s}%s" % (sign, multiplier._index, ds)] * count)
+
+        return r"\{ " + " ".join(elements) + r" \}"
+
+
+# Compositions are cached so that repeatedly forming things like the
+# d'Alembertian (Dmu ^ Dmu) only multiplies out the operators once per config.
+_compound_cache = {}
+
+
+def compose(*operators, cfg=cfg):
+    """Compose differential operators into a single CompoundDifferential"""
+    flat = []
+    for op in operators:
+        flat.extend(op.operators if isinstance(op, CompoundDifferential) else [op])
+
+    key = (tuple(tuple((a._index, a._sign) for a in op.wrt) for op in flat), cfg.fingerprint)
+    compound = _compound_cache.get(key)
+
+    if compound is None:
+        compound = CompoundDifferential(flat, cfg=cfg)
+        _compound_cache[key] = compound
+
+    return compound
+
+
 @full.add((AR_differential, MultiVector))
 def _full_differential_mvec(diff, mvec, cfg=cfg):
     res = diff(mvec, cfg=cfg)
@@ -113,3 +338,34 @@ def _full_differential_mvec(diff, mvec, cfg=cfg):
 def _full_mvec_differential_mvec(mvec, diff, cfg=cfg):
     res = diff(mvec, cfg=cfg, div="by")
     return res
+
+
+@full.add((CompoundDifferential, MultiVector))
+def _full_compound_mvec(diff, mvec, cfg=cfg):
+    return diff(mvec, cfg=cfg)
+
+
+@full.add((MultiVector, CompoundDifferential))
+def _full_mvec_compound(mvec, diff, cfg=cfg):
+    # (M D1) D2 == D2(D1(M)) under division by
+    return diff.reversed()(mvec, cfg=cfg, div="by")
+
+
+@full.add((AR_differential, AR_differential))
+def _full_differential_differential(d1, d2, cfg=cfg):
+    return compose(d1, d2, cfg=cfg)
+
+
+@full.add((AR_differential, CompoundDifferential))
+def _full_differential_compound(d1, d2, cfg=cfg):
+    return compose(d1, d2, cfg=cfg)
+
+
+@full.add((CompoundDifferential, AR_differential))
+def _full_compound_differential(d1, d2, cfg=cfg):
+    return compose(d1, d2, cfg=cfg)
+
+
+@full.add((CompoundDifferential, CompoundDifferential))
+def _full_compound_compound(d1, d2, cfg=cfg):
+    return compose(d1, d2, cfg=cfg)
@@ -7,7 +7,7 @@ from .div import div_by, div_into
 from .dual import MM_bar, dual
 from .full import find_prod, full, inverse
 from .hermitian import dagger, hermitian
-from .project import project
+from .project import project, projected_full
 from .rev import rev
 
 __all__ = [
@@ -17,6 +17,7 @@ __all__ = [
     "div_by",
     "div_into",
     "project",
+    "projected_full",
     "hermitian",
     "dagger",
     "commutator",
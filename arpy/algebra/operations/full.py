@@ -36,12 +36,20 @@ from functools import wraps
 
 from ...config import config as cfg
 from ...utils.concepts.dispatch import dispatch_on
+from ..budget import budgeted, reserve
 from ..data_types import Alpha, MultiVector, Term
 
 POINT = "p"
 
 
 def product_cache(func):
+    """
+    Memoise products for each (metric, allowed) pair. If a `loader` has been
+    set on the wrapped function (see atlas.py) then it is given the chance to
+    fill the cache with a whole Cayley table before falling back to computing
+    the individual product. The cache itself can be swapped out using
+    `set_cache` (arpy.stats uses this to count hits and misses).
+    """
     cache = dict()
 
     @wraps(func)
@@ -52,11 +60,22 @@ def product_cache(func):
         if result:
             return copy(result)
 
+        # Not a second lookup with get() so that this is counted once by caches
+        # that count their lookups (see arpy.stats)
+        if wrapped.loader is not None and wrapped.loader(cfg) and args in cache:
+            return copy(cache[args])
+
         result = func(i, j, cfg=cfg)
         cache[args] = result
         return copy(result)
 
+    def set_cache(new):
+        nonlocal cache
+        cache = wrapped.cache = new
+
     wrapped.cache = cache
+    wrapped.loader = None
+    wrapped.set_cache = set_cache
     return wrapped
 
 
@@ -120,12 +139,21 @@ def inverse(a, cfg=cfg):
     return Alpha(a._index, (find_prod(a, a, cfg)._sign * a._sign), cfg=cfg)
 
 
+@budgeted
 @dispatch_on((0, 1))
 def full(a, b, cfg=cfg):
-    """Compute the Full product of two elements"""
+    """
+    Compute the Full product of two elements.
+    Pass `budget=Budget(...)` to limit the size and run time of the product.
+    """
     raise NotImplementedError
 
 
+# The products of the individual terms of a MultiVector are covered by the
+# budget checks made for the MultiVector so they skip the budgeted wrapper
+_term_full = full.__wrapped__
+
+
 @full.add((Alpha, Alpha))
 def _full_alpha_alpha(a, b, cfg=cfg):
     return find_prod(a, b, cfg)
@@ -157,19 +185,28 @@ def _full_term_term(a, b, cfg=cfg):
 
 @full.add((MultiVector, MultiVector))
 def _full_mvec_mvec(mv1, mv2, cfg=cfg):
-    prod = MultiVector((full(i, j, cfg) for i in mv1 for j in mv2), cfg=cfg)
-    return prod
+    usage = reserve(len(mv1) * len(mv2))
+    if usage is None:
+        return MultiVector((_term_full(i, j, cfg) for i in mv1 for j in mv2), cfg=cfg)
+
+    def terms():
+        for i in mv1:
+            usage.check()
+            for j in mv2:
+                yield _term_full(i, j, cfg)
+
+    return MultiVector(terms(), cfg=cfg)
 
 
 @full.add((Alpha, MultiVector))
 def _full_alpha_mvec(a, m, cfg=cfg):
-    prod = MultiVector((full(a, comp, cfg) for comp in m), cfg=cfg)
+    prod = MultiVector((_term_full(a, comp, cfg) for comp in m), cfg=cfg)
     return prod
 
 
 @full.add((MultiVector, Alpha))
 def _full_mvec_alpha(m, a, cfg=cfg):
-    prod = MultiVector((full(comp, a, cfg) for comp in m), cfg=cfg)
+    prod = MultiVector((_term_full(comp, a, cfg) for comp in m), cfg=cfg)
     return prod
 
 
@@ -1,7 +1,7 @@
 from ...config import config as cfg
 from ...utils.concepts.dispatch import dispatch_on
 from ..data_types import Alpha, MultiVector, Term
-from .full import POINT
+from .full import POINT, _term_full, find_prod, full
 
 
 @dispatch_on(index=0)
@@ -54,3 +54,80 @@ def _project_multivector(element, grade, cfg=cfg):
                 correct_grade.append(term)
     res = MultiVector(correct_grade, cfg=cfg)
     return res
+
+
+def _target_indices(target, cfg):
+    """
+    Convert a projection target into the set of alpha indices to keep. The
+    target can be a grade (int), a space separated string of alpha indices,
+    an Alpha or an iterable of indices / Alphas.
+    """
+    if isinstance(target, int):
+        if target == 0:
+            return {POINT}
+        return {a for a in cfg.allowed if len(a) == target and a != POINT}
+
+    if isinstance(target, str):
+        target = target.split()
+    elif isinstance(target, Alpha):
+        target = [target]
+
+    return {t._index if isinstance(t, Alpha) else t for t in target}
+
+
+@dispatch_on((0, 1))
+def projected_full(a, b, target, cfg=cfg):
+    """
+    Compute only the parts of the full product of a and b that land in the
+    target grade or set of alphas: equivalent to project(full(a, b), n) or
+    full(a, b)["0123"] but without forming the rest of the product.
+
+    This default implementation forms the whole product and filters it.
+    """
+    targets = _target_indices(target, cfg)
+    prod = full(a, b, cfg=cfg)
+
+    if isinstance(prod, MultiVector):
+        return MultiVector([t for t in prod if t.index in targets], cfg=cfg)
+
+    index = prod._index if isinstance(prod, Alpha) else prod.index
+    return prod if index in targets else None
+
+
+def _landing_in(left, right, targets, cfg):
+    """
+    For each distinct alpha index of left, the terms of right whose product
+    with it is in targets. Products are looked up in the Cayley table once per
+    pair of indices and the original term order of right is preserved.
+    """
+    right_indices = {j.index for j in right}
+    rows = {}
+
+    for i_ix in {i.index for i in left}:
+        keep = {
+            j_ix
+            for j_ix in right_indices
+            if find_prod(Alpha(i_ix, cfg=cfg), Alpha(j_ix, cfg=cfg), cfg)._index in targets
+        }
+        rows[i_ix] = [j for j in right if j.index in keep]
+
+    return rows
+
+
+@projected_full.add((MultiVector, MultiVector))
+def _projected_full_mvec_mvec(mv1, mv2, target, cfg=cfg):
+    rows = _landing_in(mv1, mv2, _target_indices(target, cfg), cfg)
+    return MultiVector((_term_full(i, j, cfg) for i in mv1 for j in rows[i.index]), cfg=cfg)
+
+
+@projected_full.add((Alpha, MultiVector))
+def _projected_full_alpha_mvec(a, m, target, cfg=cfg):
+    rows = _landing_in([Term(a._index, cfg=cfg)], m, _target_indices(target, cfg), cfg)
+    return MultiVector((_term_full(a, j, cfg) for j in rows[a._index]), cfg=cfg)
+
+
+@projected_full.add((MultiVector, Alpha))
+def _projected_full_mvec_alpha(m, a, target, cfg=cfg):
+    targets = _target_indices(target, cfg)
+    rows = _landing_in(m, [Term(a._index, cfg=cfg)], targets, cfg)
+    return MultiVector((_term_full(i, a, cfg) for i in m if rows[i.index]), cfg=cfg)
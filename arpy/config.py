@@ -1,3 +1,33 @@
+# The MultiVectors and differential operators that are defined for each config
+# by `update_env` (see arpy __init__). They are only built when first used.
+PREDEFINED = [
+    "p",
+    "h",
+    "q",
+    "t",
+    "A",
+    "B",
+    "E",
+    "F",
+    "T",
+    "G",
+    "zet_B",
+    "zet_T",
+    "zet_A",
+    "zet_E",
+    "Fp",
+    "zet_F",
+    "Dmu",
+    "d",
+    "DG",
+    "DF",
+    "DB",
+    "DT",
+    "DA",
+    "DE",
+]
+
+
 class ARConfig:
     """The arpy paramater configuration object"""
 
@@ -8,11 +38,23 @@ class ARConfig:
         self._metric = self._convert_metric(metric)
         self.original_metric = metric
         self.division_type = div
+        # Mapping of Xi value -> the alpha indices that it depends on. Any Xi
+        # that is not listed is assumed to depend on everything.
+        self.xi_dependencies = {}
 
         # Generate the config and bind to the calling scope
         self.update_config()
         # update_env in the __init__
 
+    def __getattr__(self, name):
+        # Only called when name has not been set: build the predefined values
+        # on first use rather than for every config that is created.
+        if name in PREDEFINED or name == "Fpq":
+            self.build_env()
+            return self.__dict__[name]
+
+        raise AttributeError("'ARConfig' object has no attribute '{}'".format(name))
+
     def __eq__(self, other):
         return all(
             [
@@ -63,6 +105,44 @@ class ARConfig:
 
         return metric
 
+    @staticmethod
+    def _validate_allowed(allowed):
+        if len(allowed) != 16:
+            raise ValueError("Must provide all 16 elements for allowed")
+        if not all([set(c).issubset(set("p0123")) for c in allowed]):
+            raise ValueError("Invalid indices for allowed: {}".format(allowed))
+
+    def derive(self, allowed=None, metric=None, div=None):
+        """
+        Create a new config, taking any parameter that is not given from this
+        one. The original config is left untouched so anything else that is
+        using it is unaffected.
+        """
+        if allowed is not None:
+            self._validate_allowed(allowed)
+
+        derived = ARConfig(
+            self._allowed if allowed is None else allowed,
+            self._metric if metric is None else metric,
+            self.division_type if div is None else div,
+        )
+        derived.xi_dependencies = dict(self.xi_dependencies)
+        return derived
+
+    @property
+    def fingerprint(self):
+        """A hashable summary of everything that affects the results of a computation"""
+        deps = tuple(sorted((xi, tuple(sorted(on))) for xi, on in self.xi_dependencies.items()))
+        return (tuple(self._metric), tuple(self._allowed), self.division_type, deps)
+
+    @classmethod
+    def from_fingerprint(cls, fingerprint):
+        """Rebuild a config from its fingerprint (e.g. in another process)"""
+        metric, allowed, div, deps = fingerprint
+        cfg = cls(list(allowed), metric, div)
+        cfg.xi_dependencies = {xi: frozenset(on) for xi, on in deps}
+        return cfg
+
     @property
     def metric(self):
         return self._metric
@@ -79,11 +159,7 @@ class ARConfig:
 
     @allowed.setter
     def allowed(self, allowed):
-        if len(allowed) != 16:
-            raise ValueError("Must provide all 16 elements for allowed")
-        if not all([set(c).issubset(set("p0123")) for c in allowed]):
-            raise ValueError("Invalid indices for allowed: {}".format(allowed))
-
+        self._validate_allowed(allowed)
         self._allowed = allowed
         self.update_config()
         self.update_env(lvl=3)  # See arpy __init__ for details
@@ -1,6 +1,6 @@
 import pytest
 
-from .. import Alpha, Term, ar, full
+from .. import Alpha, Term, ar, dagger, full, project
 
 
 def test_creation():
@@ -44,3 +44,147 @@ def test_differential():
     assert ar("foo ") is None
     foo = Alpha("1")
     assert ar("foo ^ foo") == Alpha("-p")
+
+
+def test_projection():
+    """Projections of products are computed correctly"""
+    from arpy import F, G
+
+    assert ar("<F ^ F!>0") == project(full(F, dagger(F)), 0)
+    assert ar("<G ^ G>2") == project(full(G, G), 2)
+    assert ar("<G G>3") == project(full(G, G), 3)
+
+
+def test_precedence():
+    """^ binds more tightly than + and ! binds more tightly than juxtaposition"""
+    from arpy import F, G, MultiVector
+
+    m1, m2 = MultiVector("1"), MultiVector("2")
+    assert ar("a1 ^ a2 ^ a3") == Alpha("123")
+    assert ar("a1 / a2 / a3") == full(full(Alpha("1"), Alpha("-2")), Alpha("-3"))
+    assert ar("m1 ^ m2 + m1") == full(m1, m2) + m1
+    assert ar("m1 + m2 ^ m1") == m1 + full(m2, m1)
+    assert ar("F F!") == full(F, dagger(F))
+    assert ar("(a1 ^ a2)!") == dagger(Alpha("12"))
+    assert ar("- (a1 ^ a2)") == Alpha("-12")
+    assert ar("G - G") == G - G
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("a / b / c", "BY(a, BY(b, c))"),
+        ("a ^ b / c", "FULL(a, BY(b, c))"),
+        ("a / b ^ c", "BY(a, FULL(b, c))"),
+        ("a b ^ c", "FULL(FULL(a, b), c)"),
+        ("a ^ b c", "FULL(a, FULL(b, c))"),
+        ("a b c", "FULL(FULL(a, b), c)"),
+        ("F F!", "FULL(F, F!)"),
+        ("(F F)!", "FULL(F, F)!"),
+    ],
+)
+def test_grouping(text, expected):
+    """^, / and \\ nest to the right, juxtaposition binds tighter and nests to the left"""
+    from .. import ARContext
+    from ..utils.syntax import BinOp, Dagger, Var
+
+    def show(node):
+        if isinstance(node, BinOp):
+            return "{}({}, {})".format(node.op, show(node.lhs), show(node.rhs))
+        if isinstance(node, Dagger):
+            return show(node.operand) + "!"
+        return node.name if isinstance(node, Var) else repr(node)
+
+    plain = ARContext(cfg=ar.cfg)
+    plain.optimise = False
+    assert show(plain.compile(text)) == expected
+
+
+def test_parse_tree():
+    """Expressions are parsed into an immutable syntax tree"""
+    from dataclasses import FrozenInstanceError
+
+    from ..utils.syntax import AlphaLit, BinOp, Dagger, Project, Var
+
+    tree = ar.compile("<F ^ F!>0 + a1")
+    projection = Project(BinOp("FULL", Var("F"), Dagger(Var("F"))), 0)
+    assert tree == BinOp("PLUS", projection, AlphaLit("1"))
+    with pytest.raises(FrozenInstanceError):
+        tree.op = "FULL"
+
+
+def test_differentials_apply_to_the_right():
+    """A differential applies to the whole product on its right"""
+    from .. import ARContext
+    from ..utils.syntax import BinOp, Var
+
+    DF, F, G = ar("DF"), ar("F"), ar("G")
+    plain = ARContext(cfg=ar.cfg)
+    plain.optimise = False
+
+    rhs = BinOp("FULL", Var("G"), Var("F"))
+    assert plain.compile("DF ^ G ^ F") == BinOp("FULL", Var("DF"), rhs)
+    assert ar("DF ^ G ^ F") == full(DF, full(G, F))
+    assert ar("(DF ^ G) ^ F") == full(full(DF, G), F)
+    assert ar("DF G F") == full(full(DF, G), F)
+    assert ar("DF ^ G ^ F") != ar("DF G F")
+
+
+@pytest.mark.parametrize("text", ["a1 ^", "(a1 ^ a2", "<a1 a2", "[a1 a2]", "^ a1", "a1 )"])
+def test_invalid_syntax(text, capsys):
+    """Invalid expressions give an error message and no result"""
+    assert ar(text) is None
+    assert capsys.readouterr().err != ""
+
+
+def test_constant_folding():
+    """Products of Alpha literals are computed when the expression is compiled"""
+    from ..utils.syntax import AlphaLit, BinOp, Var
+
+    assert ar.compile("a1 ^ a2") == AlphaLit("12")
+    assert ar.compile("-(a2 / a1)!") == AlphaLit("12")
+    assert ar.compile("a1 ^ a2 ^ F") == BinOp("FULL", AlphaLit("12"), Var("F"))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "F ^ F! ^ F",
+        "a0 ^ G ^ F ^ a0",
+        "<G ^ F ^ F!>0",
+        "(F ^ F!) + (F ^ F!)",
+        "d F ^ F!",
+        "F ^ d ^ F!",
+        "<F ^ F!>0 - <F ^ F!>0",
+    ],
+)
+def test_optimised_matches_parsed(text):
+    """Optimised expressions give the same result as the tree they came from"""
+    from .. import ARContext
+
+    plain = ARContext(cfg=ar.cfg)
+    plain.optimise = False
+
+    assert ar(text) == plain(text)
+
+
+def test_chain_order():
+    """Chains of full products multiply their smallest operands first"""
+    from .. import MultiVector
+    from ..utils.syntax import chain_order
+
+    big, small = MultiVector("p 0 1 2 3 23 31 12"), MultiVector("1 2")
+
+    assert chain_order([big, big, small]) == {(1, 2): 1, (0, 1): 0, (0, 2): 0}
+    assert chain_order([small, big, big])[(0, 2)] == 1
+    assert chain_order([Alpha("1"), Alpha("2"), Alpha("3")])[(0, 2)] == 1
+
+
+def test_shared_subtrees():
+    """Repeated sub-expressions are only evaluated once"""
+    from ..utils.syntax import Let, Var
+
+    tree = ar.compile("(F ^ F!) + (F ^ F!)")
+    assert isinstance(tree, Let)
+    assert len(tree.bindings) == 1
+    assert tree.body.lhs == tree.body.rhs == Var("%0")
@@ -0,0 +1,77 @@
+from itertools import product
+
+import pytest
+
+from .. import Alpha, ARConfig, config, find_prod, reorder_allowed
+from ..algebra.atlas import CayleyAtlas, clear_atlas, compute_table, decode, use_atlas
+from .utils import metrics
+
+
+@pytest.fixture
+def atlas_path(tmp_path):
+    yield str(tmp_path / "cayley.atlas")
+    clear_atlas()
+
+
+def test_table_matches_find_prod(atlas_path):
+    """Every entry in a stored table is the product computed by find_prod"""
+    atlas = CayleyAtlas(atlas_path)
+    for metric in metrics:
+        cfg = ARConfig(config.allowed, metric, config.division_type)
+        allowed = cfg.allowed
+        table = atlas.table(cfg)
+
+        for (r, i), (c, j) in product(enumerate(allowed), enumerate(allowed)):
+            prod = find_prod(Alpha(i, cfg=cfg), Alpha(j, cfg=cfg), cfg=cfg)
+            assert decode(table, allowed, r, c) == (prod._index, prod._sign)
+
+
+def test_empty_file(atlas_path):
+    """A file that has been created but not yet written to is initialised"""
+    open(atlas_path, "wb").close()
+
+    atlas = CayleyAtlas(atlas_path)
+    assert len(atlas) == 0
+    assert atlas.table(config) == compute_table(config)
+
+
+def test_tables_are_persisted(atlas_path, monkeypatch):
+    """Re-opening an atlas loads existing tables rather than recomputing them"""
+    CayleyAtlas(atlas_path).table(config)
+
+    def _fail(cfg):
+        raise AssertionError("table should have been loaded from disk")
+
+    monkeypatch.setattr("arpy.algebra.atlas.compute_table", _fail)
+    atlas = CayleyAtlas(atlas_path)
+    assert len(atlas) == 1
+    assert atlas.table(config) == compute_table(config)
+
+
+def test_index_grows(atlas_path):
+    """Adding more tables than the initial index can hold keeps every table"""
+    orders = ["pBtThAqE", "pthqBTAE", "BTAEpthq", "pTtBhEqA"]
+    configs = [
+        ARConfig(reorder_allowed(config.allowed, order), metric, config.division_type)
+        for order in orders
+        for metric in metrics
+    ]
+    atlas = CayleyAtlas(atlas_path)
+    for cfg in configs:
+        atlas.table(cfg)
+
+    reopened = CayleyAtlas(atlas_path)
+    assert len(reopened) == len(configs)
+    for cfg in configs:
+        assert reopened.table(cfg) == compute_table(cfg)
+
+
+def test_use_atlas_warms_find_prod(atlas_path):
+    """Once an atlas is in use, find_prod is served from the loaded table"""
+    cfg = ARConfig(config.allowed, "-+++", config.division_type)
+    atlas = use_atlas(atlas_path)
+    a1, a2 = Alpha("1", cfg=cfg), Alpha("-023", cfg=cfg)
+    expected = find_prod.__wrapped__(a1, a2, cfg=cfg)
+
+    assert find_prod(a1, a2, cfg=cfg) == expected
+    assert atlas.warm(cfg) is False
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from .. import DG, Budget, BudgetExceeded, Dmu, G, ar, full
+from ..algebra.budget import Cancelled, reserve
+
+
+def test_max_terms():
+    """Products and differentials that would be too large are never computed"""
+    budget = Budget(max_terms=100)
+
+    with pytest.raises(BudgetExceeded):
+        full(G, G, budget=budget)
+    with pytest.raises(BudgetExceeded):
+        DG(G, budget=budget)
+    with pytest.raises(BudgetExceeded):
+        ar("G ^ G", budget=budget)
+
+    assert len(Dmu(G, budget=budget)) == 64
+    assert reserve(1000000000) is None  # The budget is no longer active
+
+
+def test_max_seconds():
+    """Computations that run for too long are stopped"""
+    with pytest.raises(BudgetExceeded):
+        ar("G ^ G ^ G", budget=Budget(max_seconds=0.01))
+
+
+def test_progress():
+    """Progress is reported after each product"""
+    progress = []
+    budget = Budget(progress=lambda terms, seconds: progress.append(terms))
+    ar("G ^ G ^ G!", budget=budget)
+
+    assert progress == [256, 256 + 4096]
+
+
+def test_cancel():
+    """A budget can be cancelled from another thread"""
+    budget = Budget()
+    timer = threading.Timer(0.05, budget.cancel)
+    timer.start()
+
+    with pytest.raises(Cancelled):
+        ar("G ^ G ^ G ^ G", budget=budget)
+
+    timer.join()
+    child = Budget().child()
+    child._parent.cancel()
+    assert child.cancelled
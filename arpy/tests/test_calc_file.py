@@ -0,0 +1,181 @@
+import pytest
+
+from ..utils.calc_file import Calculation, StepCache, parse_sweeps, run_calculation, run_sweep
+
+script = [
+    "// ALLOWED: p 23 31 12 0 023 031 012 123 1 2 3 0123 01 02 03",
+    "// METRIC: +---",
+    "odd = {1, 2, 3, 023, 031, 012}",
+    "Dodd = Dmu ^ odd",
+    "FFdag = F ^ F!",
+    "both = Dodd + FFdag",
+    "// METRIC: -+++",
+    "FFdag = F ^ F!",
+]
+
+
+def test_step_dependencies():
+    """Each step depends on the most recent definition of the names it reads"""
+    calc = Calculation(script)
+    assert calc.dependencies() == {3: [], 4: [3], 5: [], 6: [4, 5], 8: []}
+
+
+def test_cached_steps_are_reused(tmp_path):
+    """Only steps affected by an edit are recomputed"""
+    calc = Calculation(script)
+    expected = list(calc.run())
+    assert calc.evaluated == [3, 4, 5, 6, 8]
+
+    calc = Calculation(script)
+    assert list(calc.run(cache=StepCache(tmp_path))) == expected
+    assert calc.evaluated == [3, 4, 5, 6, 8]
+
+    # A new cache instance reads the results back from disk
+    calc = Calculation(script)
+    assert list(calc.run(cache=StepCache(tmp_path))) == expected
+    assert calc.evaluated == []
+
+    edited = list(script)
+    edited[2] = "odd = {1, 2, 3}"
+    calc = Calculation(edited)
+    list(calc.run(cache=StepCache(tmp_path)))
+    assert calc.evaluated == [3, 4, 6]
+
+
+def test_cached_steps_from_other_versions_are_ignored(tmp_path, monkeypatch):
+    """Results cached by a different version of arpy are not re-used"""
+    import arpy
+
+    list(Calculation(script).run(cache=StepCache(tmp_path)))
+    monkeypatch.setattr(arpy, "__version__", arpy.__version__ + ".dev0")
+
+    calc = Calculation(script)
+    list(calc.run(cache=StepCache(tmp_path)))
+    assert calc.evaluated == [3, 4, 5, 6, 8]
+
+
+def test_memory_only_cache():
+    """Caches without a path keep results in memory and write nothing to disk"""
+    cache = StepCache()
+    list(Calculation(script).run(cache=cache))
+
+    calc = Calculation(script)
+    list(calc.run(cache=cache))
+    assert calc.evaluated == []
+
+    calc = Calculation(script)
+    list(calc.run(cache=StepCache()))
+    assert calc.evaluated == [3, 4, 5, 6, 8]
+
+
+def test_cache_size_is_bounded():
+    """Only the most recently used results are kept in memory"""
+    import pickle
+
+    cache = StepCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is StepCache.MISSING
+    assert [cache.get(k) for k in "ac"] == [1, 3]
+    assert pickle.loads(pickle.dumps(cache)).max_entries == 2
+
+
+def test_run_calculation_output():
+    """Comments, definitions and results are all included in the output"""
+    output = run_calculation(script[:2] + ["# A comment", "m = {1 2}", "m2 = m ^ m"])
+    assert output == [
+        script[0],
+        script[1],
+        "# A comment",
+        "m =  {",
+        "  α₁   ( ξ₁ )",
+        "  α₂   ( ξ₂ )",
+        "}",
+        "m2 = m ^ m",
+        "{",
+        "  αₚ   ( - ξ₁^2 - ξ₂^2 )",
+        "  α₁₂  ( ξ₁.ξ₂ - ξ₁.ξ₂ )",
+        "}",
+    ]
+
+
+def test_parallel_steps(tmp_path):
+    """Running steps on a process pool gives the same output in the same order"""
+    calc = Calculation(script)
+    expected = list(calc.run())
+
+    calc = Calculation(script)
+    assert list(calc.run(jobs=3)) == expected
+    assert sorted(calc.evaluated) == [3, 4, 5, 6, 8]
+
+    cache = StepCache(tmp_path)
+    list(Calculation(script[:5]).run(cache=cache))
+    calc = Calculation(script)
+    assert list(calc.run(cache=cache, jobs=2)) == expected
+    assert sorted(calc.evaluated) == [6, 8]
+
+
+def test_streamed_output():
+    """Output for each line is produced before later steps are evaluated"""
+    calc = Calculation(script)
+    output = calc.run(timings=True)
+
+    assert next(output) == script[0]
+    assert next(output) == script[1]
+    assert next(output).startswith("odd =  {")
+    assert calc.evaluated == [3]
+
+    dodd = next(output)
+    assert dodd.startswith("Dodd = Dmu ^ odd")
+    assert dodd.endswith(" terms]")
+    assert calc.evaluated == [3, 4]
+
+
+def test_sweeps():
+    """Every combination of the swept values is run"""
+    sweeps = parse_sweeps(["// SWEEP: METRIC +--- -+++", "// SWEEP: DIVISION by into"])
+    assert [s["division"] for s in sweeps] == ["by", "into", "by", "into"]
+    assert [s["metric"] for s in sweeps][1:3] == [(1, -1, -1, -1), (-1, 1, 1, 1)]
+
+    with pytest.raises(ValueError):
+        Calculation(script, {"metric": (-1, 1, 1, 1)})
+
+
+@pytest.mark.parametrize(
+    "directive",
+    [
+        "// SWEEP: DIVISION by onto",
+        "// SWEEP: METRIC +--- +-+",
+        "// SWEEP: METRIC +--- +x--",
+        "// SWEEP: ALLOWED p 23 31 12",
+        "// SWEEP: DIVISION",
+        "// SWEEP: SIGNS + -",
+    ],
+)
+def test_invalid_sweeps(directive):
+    """Invalid SWEEP directives are reported along with their line number"""
+    with pytest.raises(ValueError, match="^Line 2: "):
+        parse_sweeps(["m = {1 2}", directive])
+
+
+def test_sweep_timings():
+    """Sweeps show the time taken and size of each result when asked to"""
+    sweep = ["// SWEEP: METRIC +--- -+++", "m = {1 2}", "m2 = m ^ m"]
+    output = "\n".join(run_sweep(sweep, timings=True))
+    assert ", 2 terms]" in output
+    assert ", 4 terms]" in output
+
+
+def test_sweep_output():
+    """Results that are the same for each configuration are only shown once"""
+    sweep = ["// SWEEP: METRIC +--- -+++", "m = {1 2}", "m2 = m ^ m"]
+    output = list(run_sweep(sweep))
+
+    columns = [[cell.rstrip() for cell in line.split(" │ ")] for line in output]
+
+    assert columns[0] == ["METRIC=+---", "METRIC=-+++"]
+    assert ["m =  {\n  α₁   ( ξ₁ )\n  α₂   ( ξ₂ )\n}"] in columns
+    assert ["  αₚ   ( - ξ₁^2 - ξ₂^2 )", "  αₚ   ( ξ₁^2 + ξ₂^2 )"] in columns
@@ -1,6 +1,6 @@
 import pytest
 
-from .. import ARContext
+from .. import ARContext, full
 
 oi_allowed = [
     "p",
@@ -68,3 +68,266 @@ def test_allowed():
     with pytest.raises(ValueError):
         with ctx2 as ar:
             ar("A1 ^ A2")
+
+
+def test_dependencies_prune_partials():
+    """Partials of Xis that do not depend on a coordinate are never created"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    full_result = ctx("Dmu G")
+
+    ctx.depends("p 0123", on="")
+    ctx.depends("23 31 12 01 02 03", on="0")
+    pruned = ctx("Dmu G")
+
+    assert len(pruned) < len(full_result)
+    for term in pruned:
+        xi = term._components[0]
+        if xi.val in ["p", "0123"]:
+            raise AssertionError("constant Xis should have no partials")
+        if xi.val in ["23", "31", "12", "01", "02", "03"]:
+            assert [p._index for p in xi.partials] == ["0"]
+
+    # Everything that survives was present in the unpruned result
+    assert all(t in full_result for t in pruned)
+
+
+def test_dependencies_validate_indices():
+    """Only valid alpha indices can be used as dependencies"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    with pytest.raises(ValueError):
+        ctx.depends("23", on="x y")
+
+
+def test_compiled_expressions_are_reused(monkeypatch):
+    """Repeated expressions are only lexed and parsed once per config"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    calls = []
+    tokenize = ctx._lexer.tokenize
+    monkeypatch.setattr(ctx._lexer, "tokenize", lambda text: calls.append(text) or tokenize(text))
+
+    for _ in range(5):
+        ctx("a1 ^ a2")
+
+    assert calls == ["a1 ^ a2"]
+
+
+def test_recently_used_expressions_are_kept(monkeypatch):
+    """The least recently used expression is the one that is dropped"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    monkeypatch.setattr(ctx, "cache_size", 2)
+    calls = []
+    tokenize = ctx._lexer.tokenize
+    monkeypatch.setattr(ctx._lexer, "tokenize", lambda text: calls.append(text) or tokenize(text))
+
+    for text in ["a1 ^ a2", "a2 ^ a3", "a1 ^ a2", "a3 ^ a1", "a1 ^ a2", "a2 ^ a3"]:
+        ctx(text)
+
+    assert calls == ["a1 ^ a2", "a2 ^ a3", "a3 ^ a1", "a2 ^ a3"]
+
+
+def test_variables_are_bound_at_evaluation():
+    """Re-using a compiled expression picks up the current value of variables"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    alpha2 = ctx("a2")
+    x = ctx("a1")
+    first = ctx("x ^ a2")
+    assert first == full(x, alpha2, cfg=ctx.cfg) == ctx("a12")
+
+    x = ctx("a3")
+    second = ctx("x ^ a2")
+    assert second == full(x, alpha2, cfg=ctx.cfg) == ctx("-a23")
+
+
+def test_evaluate_ignores_calling_scope():
+    """evaluate only sees the context's variables and the given bindings"""
+    from ..utils.syntax import AR_Error
+
+    ctx = ARContext(oi_allowed, "+---", "into")
+    x = ctx("a1")
+
+    assert ctx("x ^ a2") == full(x, ctx("a2"), cfg=ctx.cfg)
+    assert ctx.evaluate("x ^ a2", {"x": ctx("a3")}) == ctx("-a23")
+    assert ctx.evaluate("F", {"F": ctx("a1")}) == ctx("a1")
+    with pytest.raises(AR_Error):
+        ctx.evaluate("x ^ a2")
+
+
+def test_map_over_bindings():
+    """map evaluates one expression for rows or columns of bindings"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    a1, a2, a3 = ctx("a1"), ctx("a2"), ctx("a3")
+    expected = [ctx("a1 ^ a2!"), ctx("a3 ^ a1!")]
+
+    assert ctx.map("A ^ B!", [{"A": a1, "B": a2}, {"A": a3, "B": a1}]) == expected
+    assert ctx.map("A ^ B!", {"A": [a1, a3], "B": [a2, a1]}) == expected
+
+    lazy = ctx.map("A ^ B!", {"A": [a1, a3], "B": [a2, a1]}, lazy=True)
+    assert not isinstance(lazy, list)
+    assert list(lazy) == expected
+
+    with pytest.raises(ValueError):
+        ctx.map("A ^ B", {"A": [a1, a2], "B": [a3]})
+
+
+def test_settings_do_not_leak_between_contexts():
+    """Changing the settings of a context leaves any shared config untouched"""
+    from ..config import ARConfig
+
+    shared = ARConfig(oi_allowed, "+---", "into")
+    ctx1, ctx2 = ARContext(cfg=shared), ARContext(cfg=shared)
+
+    ctx1.metric = "-+++"
+    ctx1.allowed = io_allowed
+    ctx1.depends("p", on="")
+
+    assert shared.metric == (1, -1, -1, -1)
+    assert shared.allowed == oi_allowed
+    assert shared.xi_dependencies == {}
+    assert ctx2.cfg is shared
+    assert ctx2("a1 ^ a1") == ctx2("-ap")
+    assert ctx1("a1 ^ a1") == ctx1("ap")
+
+
+def test_contexts_evaluate_concurrently():
+    """Contexts with different configs can be used from a thread pool"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    contexts = [
+        ARContext(oi_allowed, "+---", "into"),
+        ARContext(io_allowed, "-+++", "by"),
+        ARContext(oi_allowed, "-+++", "into"),
+        ARContext(io_allowed, "+---", "by"),
+    ]
+    exprs = ["F ^ F!", "Dmu G", "<G ^ F>0", "a1 ^ a23 ^ a0"]
+    expected = [[ctx.evaluate(e) for e in exprs] for ctx in contexts]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [
+            [pool.submit(ctx.evaluate, e) for e in exprs] for ctx in contexts for _ in range(4)
+        ]
+        results = [[f.result() for f in row] for row in futures]
+
+    for n, row in enumerate(results):
+        assert row == expected[n // 4]
+
+
+def test_async_evaluation():
+    """aeval and amap give the same results as their blocking counterparts"""
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+
+    ctx = ARContext(io_allowed, "-+++", "by")
+    ctx.depends("p", on="")
+    a1, a2, a3 = ctx("a1"), ctx("a2"), ctx("a3")
+    rows = [{"A": a1, "B": a2}, {"A": a3, "B": a1}, {"A": a2, "B": a2}]
+
+    async def run():
+        single = await ctx.aeval("A ^ B!", {"A": a1, "B": a2})
+        batch = await ctx.amap("A ^ B!", rows, concurrency=2)
+        diff = await ctx.aeval("Dmu G")
+        return single, batch, diff
+
+    assert asyncio.run(run()) == (ctx("a1 ^ a2!"), ctx.map("A ^ B!", rows), ctx("Dmu G"))
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        ctx.executor = pool
+        assert asyncio.run(run()) == (ctx("a1 ^ a2!"), ctx.map("A ^ B!", rows), ctx("Dmu G"))
+
+
+def test_async_cancellation():
+    """Cancelling amap stops any evaluations that have not yet started"""
+    import asyncio
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    started = []
+
+    class SlowBinding(dict):
+        def __getitem__(self, key):
+            started.append(key)
+            time.sleep(0.05)
+            return super().__getitem__(key)
+
+    ctx = ARContext(oi_allowed, "+---", "into")
+    rows = [SlowBinding(x=ctx("a1")) for _ in range(20)]
+
+    async def run():
+        task = asyncio.ensure_future(ctx.amap("x ^ x", rows))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ctx.executor = pool
+        asyncio.run(run())
+
+    assert 0 < len(started) < len(rows)
+
+
+def test_async_cancellation_stops_running_evaluations():
+    """Cancelling aeval stops an evaluation that is already running in a thread"""
+    import asyncio
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    ctx = ARContext(oi_allowed, "+---", "into")
+
+    async def run():
+        task = asyncio.ensure_future(ctx.aeval("G ^ G ^ G ^ G"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ctx.executor = pool
+        asyncio.run(run())
+
+    # Waiting for the pool to shut down would take far longer than this if
+    # the evaluation had been left running
+    assert time.monotonic() - start < 2
+
+
+def test_contexts_share_standard_variables():
+    """Contexts for the same config share their standard variables"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    other = ARContext(oi_allowed, "+---", "into")
+    assert ctx._parser is other._parser
+    assert ctx("G") is other("G")
+
+    # Cancelling terms never modifies the shared values
+    G = ctx("G")
+    terms = list(G)
+    ctx("G", cancel_terms=True)
+    assert list(G) == terms
+
+
+def test_clone():
+    """Clones share compiled expressions but config and variables are set on each separately"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    ctx._vars["x"] = ctx("a1")
+    clone = ctx.clone()
+    clone._vars["x"] = ctx("a2")
+
+    assert clone.cfg is not ctx.cfg and clone.cfg.fingerprint == ctx.cfg.fingerprint
+    assert clone._compiled is ctx._compiled
+    assert ctx.evaluate("x") == ctx("a1")
+    assert clone.evaluate("x") == ctx("a2")
+
+
+def test_contexts_have_their_own_config():
+    """Modifying the config of one context never changes another with the same settings"""
+    ctx = ARContext(oi_allowed, "+---", "into")
+    other = ARContext(oi_allowed, "+---", "into")
+    square = other("a1 ^ a1")
+    assert other.cfg is not ctx.cfg
+
+    ctx.cfg.metric = "-+++"
+    assert other.metric == (1, -1, -1, -1)
+    assert other("a1 ^ a1") == square
+
+    clone = other.clone()
+    clone.cfg.metric = "-+++"
+    assert other.metric == (1, -1, -1, -1)
@@ -0,0 +1,67 @@
+import socket
+import threading
+
+import pytest
+
+from ..utils import daemon
+from ..utils.calc_file import run_calculation
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = daemon.Daemon(str(tmp_path / "arpy.sock"))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def run(server, script, **options):
+    messages = list(daemon.request(daemon.connect(server.path), script, **options))
+    stdout = b"".join(p for k, p in messages if k == daemon.STDOUT).decode("utf8")
+    stderr = b"".join(p for k, p in messages if k == daemon.STDERR).decode("utf8")
+    return stdout, stderr, messages[-1]
+
+
+def test_daemon_output(server):
+    """The daemon gives the same output as running the calculation locally"""
+    script = ["// METRIC: -+++", "m = {1 2}", "m2 = m ^ m", "x = m ^ nope"]
+    stdout, stderr, last = run(server, script)
+
+    assert stdout.splitlines() == run_calculation(script)
+    assert stderr == '"nope" is not currently defined\n'
+    assert last == (daemon.EXIT, b"\x00")
+
+
+def test_daemon_failure(server):
+    """Errors are sent back to the client along with a non-zero exit status"""
+    stdout, stderr, last = run(server, ["// METRIC: +-"])
+
+    assert "Traceback" in stderr
+    assert last == (daemon.EXIT, b"\x01")
+
+
+def test_no_daemon(tmp_path):
+    """Connecting fails when the daemon is not running"""
+    with pytest.raises(OSError):
+        daemon.connect(str(tmp_path / "missing.sock"))
+
+
+def test_one_daemon_per_socket(server):
+    """A second daemon does not take over the socket of one that is running"""
+    with pytest.raises(daemon.AlreadyRunning):
+        daemon.Daemon(server.path)
+
+    assert run(server, ["m = {1 2}"])[2] == (daemon.EXIT, b"\x00")
+
+
+def test_stale_socket(tmp_path):
+    """A socket left behind by a daemon that is no longer running is replaced"""
+    path = str(tmp_path / "arpy.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)
+
+    server = daemon.Daemon(path)
+    server.server_close()
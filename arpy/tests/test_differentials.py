@@ -1,7 +1,8 @@
 import pytest
 
-from .. import Alpha, Term, Xi, config
-from ..algebra.differential import term_partial
+from .. import DE, DF, DG, A, Alpha, ARConfig, Dmu, F, G, MultiVector, Term, config, full
+from ..algebra.differential import AR_differential, CompoundDifferential, term_partial
+from .utils import metrics
 
 # from ..reductions.del_grouping import replace_curl, replace_div, replace_grad, replace_partials
 
@@ -17,6 +18,51 @@ def test_new_component_partial():
     assert differentiated is not original
 
 
+@pytest.mark.parametrize("div", ["by", "into"])
+def test_division_table_matches_term_partial(div):
+    """Applying a differential via its division table matches term_partial"""
+    for metric in metrics:
+        cfg = ARConfig(config.allowed, metric, div)
+        diff = AR_differential(cfg.allowed, cfg=cfg)
+        mvec = MultiVector(cfg.allowed, cfg=cfg)
+        expected = MultiVector(
+            [term_partial(t, wrt, cfg, div) for t in mvec for wrt in diff.wrt], cfg=cfg
+        )
+        assert diff(mvec) == expected
+
+
+def test_differential_leaves_operand_untouched():
+    """Differentiating does not modify the terms of the original MultiVector"""
+    before = repr(G)
+    DG(DG(G))
+    assert repr(G) == before
+
+
+def _cancelled(terms):
+    """Order independent representation of a MultiVector after cancellation"""
+    return sorted(repr(t) for t in MultiVector(list(terms)).cancel_terms())
+
+
+@pytest.mark.parametrize("d1,d2", [(Dmu, Dmu), (DG, DF), (DF, DE), (Dmu, DG)])
+@pytest.mark.parametrize("mvec", [G, F, A])
+def test_compound_matches_sequential(d1, d2, mvec):
+    """Composed operators give the same result as applying each operator in turn"""
+    compound = full(d1, d2)
+    assert isinstance(compound, CompoundDifferential)
+    assert _cancelled(full(compound, mvec)) == _cancelled(d1(d2(mvec)))
+    assert _cancelled(full(mvec, compound)) == _cancelled(full(full(mvec, d1), d2))
+
+
+def test_dalembertian():
+    """Mixed partials cancel when composing Dmu with itself"""
+    box = full(Dmu, Dmu)
+    assert len(box) == 4
+    for partials, multiplier, count in box.terms(config, config.division_type):
+        assert len(set(partials)) == 1
+        assert multiplier._index == "p"
+        assert count == 1
+
+
 # @pytest.mark.parametrize("sign", [1, -1])
 # def test_replace_curl(sign):
 #     """
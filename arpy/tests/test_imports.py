@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+CHECK = """
+import sys
+import arpy
+
+for module in ["asyncio", "arpy.utils.lexparse", "arpy.utils.visualisation", "inspect"]:
+    assert module not in sys.modules, module
+assert "G" not in vars(arpy) and "G" not in vars(arpy.config)
+
+assert arpy.G is arpy.config.G
+assert arpy.ar("a1 ^ a2") == arpy.Alpha("12")
+assert "arpy.utils.lexparse" in sys.modules
+"""
+
+
+def test_lazy_import():
+    """Importing arpy does not import or build anything until it is used"""
+    subprocess.run([sys.executable, "-c", CHECK], check=True)
+
+
+CALCULATION = """
+import sys
+from arpy.utils.calc_file import run_calculation
+
+run_calculation(["// METRIC: +---", "a = {0 1 2 3}", "b = G ^ a", "c = Dmu ^ b"])
+assert "arpy.utils.visualisation" not in sys.modules
+"""
+
+
+def test_calculations_stay_lazy():
+    """Running a calculation only imports the parts of arpy that its steps use"""
+    subprocess.run([sys.executable, "-c", CALCULATION], check=True)
+
+
+def test_star_import():
+    """Lazily loaded names are still available via `from arpy import *`"""
+    namespace = {}
+    exec("from arpy import *", namespace)
+    assert {"G", "Dmu", "ar", "ARContext", "cayley", "Zet"} <= set(namespace)
@@ -0,0 +1,55 @@
+import tracemalloc
+
+from .. import ARContext, Term, config, full, profile_memory
+from ..utils.calc_file import run_calculation
+
+
+def test_operations_are_profiled():
+    """Each operation records its calls, memory use and the objects it created"""
+    ctx = ARContext(cfg=config)
+
+    with profile_memory() as profile:
+        result = ctx("G ^ G")
+
+    record = profile.operations["full(MultiVector, MultiVector)"]
+    assert record["calls"] == 1
+    assert record["peak"] > 0
+    assert record["objects"]["MultiVector"] >= 1
+    assert record["objects"]["Term"] >= len(result)
+    assert profile.operations["full(Term, Term)"]["calls"] == 256
+    assert "full(MultiVector, MultiVector)" in profile.report()
+
+
+def test_peaks_without_reset_peak(monkeypatch):
+    """Peaks are still recorded by versions of Python without tracemalloc.reset_peak"""
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    ctx = ARContext(cfg=config)
+
+    with profile_memory() as profile:
+        ctx("G ^ G")
+
+    record = profile.operations["full(MultiVector, MultiVector)"]
+    assert record["peak"] >= record["allocated"] > 0
+
+
+def test_steps_are_profiled():
+    """Each calculation step is recorded along with where its memory went"""
+    script = ["// METRIC: +---", "a = {0 1 2 3}", "b = G ^ a"]
+
+    with profile_memory(sites=2) as profile:
+        run_calculation(script)
+
+    assert [s["step"] for s in profile.steps] == ["{0 1 2 3}", "G ^ a"]
+    assert profile.steps[1]["objects"]["Term"] >= 64
+    assert 0 < len(profile.steps[1]["sites"]) <= 2
+
+
+def test_profiling_stops():
+    """The original functions are restored and tracing stops with the profile"""
+    implementation = full.implementations[(Term, Term)]
+
+    with profile_memory():
+        assert tracemalloc.is_tracing()
+
+    assert not tracemalloc.is_tracing()
+    assert full.implementations[(Term, Term)] is implementation
@@ -1,4 +1,8 @@
+import pytest
+
 from .. import (
+    F,
+    G,
     Alpha,
     ARConfig,
     MultiVector,
@@ -7,8 +11,10 @@ from .. import (
     config,
     dagger,
     find_prod,
+    full,
     inverse,
     project,
+    projected_full,
 )
 from .utils import metrics
 
@@ -99,3 +105,19 @@ def test_project_multivector():
     assert project(m1, 0) == MultiVector()
     assert project(m2, 0) == m2
     assert project(m2, 2) == MultiVector()
+
+
+@pytest.mark.parametrize("grade", [0, 1, 2, 3, 4])
+def test_projected_full_grades(grade):
+    """
+    Pushing a grade projection into a product gives the same result as
+    projecting the full product
+    """
+    for a, b in [(G, G), (F, dagger(F)), (G, F), (Alpha("0123"), G), (G, Alpha("1"))]:
+        assert projected_full(a, b, grade) == project(full(a, b), grade)
+
+
+def test_projected_full_alphas():
+    """Projecting onto a set of alphas matches indexing into the full product"""
+    assert projected_full(G, G, "0123") == full(G, G)["0123"]
+    assert projected_full(F, F, [Alpha("p"), "0123"]) == full(F, F)["p"] + full(F, F)["0123"]
@@ -0,0 +1,81 @@
+import io
+import json
+
+import pytest
+
+from .. import Alpha, Dmu, F, G, MultiVector, Term, Xi, ar
+from ..utils.calc_file import Calculation
+from ..utils.serialise import dumps, from_record, loads, read_frames, to_record, write_frame
+
+values = [Alpha("12", -1), Term("-012"), ar("F ^ F!"), Dmu(F), G]
+
+
+@pytest.mark.parametrize("value", values)
+def test_record_round_trip(value):
+    """Values can be rebuilt from their JSON records"""
+    record = json.loads(json.dumps(to_record(value)))
+    assert from_record(record) == value
+
+
+@pytest.mark.parametrize("value", values)
+def test_binary_round_trip(value):
+    """Values can be rebuilt from their binary encoding"""
+    assert loads(dumps(value)) == value
+
+
+def test_binary_tex_round_trip():
+    """The LaTeX values of Xis are kept by the binary encoding"""
+    xi = Xi("12", tex=r"\phi")
+    value = MultiVector([Term(Alpha("12"), [xi]), Term("0")])
+
+    def tex(mvec):
+        return [(x._tex_val, x.__tex__()) for t in mvec for x in t._components]
+
+    assert tex(loads(dumps(value))) == tex(value)
+    assert tex(value)[0][0] == r"\phi"
+
+
+def test_binary_limits(monkeypatch):
+    """Values that do not fit in the binary format are rejected instead of corrupted"""
+    from ..utils import serialise
+
+    with pytest.raises(ValueError, match="Xis in a term"):
+        dumps(Term(Alpha("12"), [Xi("12") for _ in range(256)]))
+
+    monkeypatch.setattr(serialise, "MAX_STRINGS", 3)
+    tex = MultiVector([Term(Alpha(a), [Xi(a, tex=a + "'")]) for a in ["1", "2"]])
+    with pytest.raises(ValueError, match="distinct strings"):
+        dumps(tex)
+
+
+def test_term_records():
+    """Term records hold the structure of the term rather than its text"""
+    record = to_record(Dmu(F))
+    assert record["type"] == "MultiVector"
+    assert record["terms"][0] == {
+        "alpha": "0",
+        "sign": -1,
+        "xis": [{"val": "01", "partials": ["1"]}],
+        "partials": [],
+    }
+    assert to_record("text") == {"type": "str", "repr": "text"}
+
+
+def test_binary_is_compact():
+    """The binary format is much smaller than JSON for large results"""
+    value = ar("G ^ G")
+    assert len(dumps(value)) * 5 < len(json.dumps(to_record(value)))
+
+
+def test_frames():
+    """Calculation steps can be streamed in the binary format"""
+    calc = Calculation(["// METRIC: -+++", "m = {1 2}", "m2 = m ^ m"])
+    stream = io.BytesIO()
+    for header, value in calc.records():
+        write_frame(stream, header, value)
+
+    stream.seek(0)
+    frames = list(read_frames(stream))
+    assert [h["var"] for h, _ in frames] == ["m", "m2"]
+    assert frames[1][0]["config"]["metric"] == "-+++"
+    assert str(frames[1][1]) == "{\n  αₚ   ( ξ₁^2 + ξ₂^2 )\n  α₁₂  ( ξ₁.ξ₂ - ξ₁.ξ₂ )\n}"
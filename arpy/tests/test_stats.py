@@ -0,0 +1,72 @@
+from copy import copy
+
+from .. import Alpha, ARContext, Term, config, find_prod, full, stats
+
+
+def test_stats_are_collected_when_enabled():
+    """Operations, allocations and expressions are counted while enabled"""
+    ctx = ARContext(cfg=config)
+    stats.reset()
+
+    with stats:
+        ctx("Dmu ^ G ^ G!")
+        copy(Alpha("12"))
+
+    collected = stats()
+    assert collected["operations"]["full(Term, Term)"]["calls"] > 0
+    assert collected["operations"]["hermitian(MultiVector)"]["calls"] == 1
+    assert collected["expressions"]["Dmu ^ G ^ G!"]["calls"] == 1
+    assert collected["context"]["evaluate"]["calls"] == 1
+    assert collected["allocated"]["Term"] > 0
+    assert collected["allocated"]["Alpha"] > 0
+    assert sum(collected["product_cache"].values()) > 0
+    assert "Dmu ^ G ^ G!" in stats.report()
+
+
+def test_stats_are_not_collected_when_disabled():
+    """Disabling stats restores the original functions"""
+    implementation = full.implementations[(Term, Term)]
+    stats.reset()
+
+    with stats:
+        assert full.implementations[(Term, Term)] is not implementation
+
+    assert full.implementations[(Term, Term)] is implementation
+    assert type(find_prod.cache) is dict
+    assert "__copy__" not in vars(Alpha)
+
+    full(Term("12"), Term("023"))
+    copy(Alpha("12"))
+    assert stats()["operations"] == {}
+    assert stats()["allocated"]["Alpha"] == 0
+
+
+def test_results_are_unchanged():
+    """Collecting stats does not change the result of a calculation"""
+    ctx = ARContext(cfg=config)
+    expected = ctx("Dmu ^ G ^ G!")
+
+    with stats:
+        result = ctx("Dmu ^ G ^ G!")
+
+    assert result == expected
+
+
+def test_product_cache_lookups_are_counted_once(monkeypatch):
+    """A miss that is filled in by the loader and the hit that follows it count once each"""
+    a, b = Alpha("1"), Alpha("2")
+    key = (a, b, tuple(config.metric), tuple(config.allowed))
+
+    def loader(cfg):
+        find_prod.cache[key] = find_prod.__wrapped__(a, b, cfg=cfg)
+        return True
+
+    monkeypatch.setattr(find_prod, "loader", loader)
+    stats.reset()
+
+    with stats:
+        find_prod.cache.pop(key, None)
+        assert find_prod(a, b, config) == Alpha("12")
+        assert find_prod(a, b, config) == Alpha("12")
+
+    assert stats()["product_cache"] == {"hits": 1, "misses": 1}
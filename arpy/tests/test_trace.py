@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from .. import AR_differential, ARContext, Term, config, full, stats, trace
+from ..utils.calc_file import run_calculation
+from ..utils.syntax import evaluate
+
+
+def _contains(outer, inner):
+    return outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_trace_records_nested_spans(tmp_path):
+    """Expressions contain the spans of their nodes and differentials"""
+    ctx = ARContext(cfg=config)
+    path = tmp_path / "trace.json"
+
+    with trace(str(path)):
+        ctx("Dmu ^ G")
+
+    events = json.loads(path.read_text())["traceEvents"]
+    by_category = {e["cat"]: e for e in events}
+    expression, differential = by_category["expression"], by_category["differential"]
+
+    assert expression["name"] == "Dmu ^ G"
+    assert expression["args"]["terms"] == 64
+    assert differential["args"] == {"input_terms": 16, "terms": 64}
+    assert _contains(expression, differential)
+    assert all(_contains(expression, e) for e in events if e["cat"] == "node")
+    assert {"Var Dmu", "Var G"} <= {e["name"] for e in events if e["cat"] == "node"}
+
+
+def test_trace_records_steps():
+    """Each step of a calculation file is a span"""
+    script = ["// METRIC: +---", "a = {0 1 2 3}", "b = a ^ a"]
+
+    with trace() as t:
+        run_calculation(script)
+
+    steps = [e for e in t.events if e["cat"] == "step"]
+    assert [s["name"] for s in steps] == ["{0 1 2 3}", "a ^ a"]
+    assert steps[1]["args"]["terms"] == 16
+
+
+def test_tracing_stops():
+    """The original functions are restored when the trace stops"""
+    call = AR_differential.__call__
+    implementation = evaluate.default
+
+    with trace():
+        assert AR_differential.__call__ is not call
+
+    assert AR_differential.__call__ is call
+    assert evaluate.default is implementation
+
+
+def test_instruments_stop_in_reverse_order():
+    """Stopping instrumentation while one started after it is active is an error"""
+    implementation = full.implementations[(Term, Term)]
+    stats.reset()
+
+    with stats:
+        t = trace()
+        t.start()
+        with pytest.raises(RuntimeError):
+            stats.disable()
+        assert stats.enabled
+        t.stop()
+
+    assert full.implementations[(Term, Term)] is implementation
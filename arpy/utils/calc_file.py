@@ -1,11 +1,33 @@
+"""
+Parsing and running .arp calculation files.
+
+Before anything is evaluated, a calculation is planned: each step records the
+names it reads, the earlier steps that it depends on and the config that it
+runs under. Each step is then given a key that is derived from its text, its
+config and the keys of the steps that it depends on. If anything upstream of
+a step changes then so does its key, so results can be cached (see
+StepCache) and re-used across runs with only the affected steps recomputed.
+"""
+import io
+import json
+import os
+import pickle
 import re
-from collections import namedtuple
-from io import StringIO
+import sys
+import threading
+import time
+from collections import ChainMap, OrderedDict, namedtuple
+from collections.abc import Mapping
+from hashlib import blake2b
+from itertools import product
 
-from arpy import *
+import arpy
 
-from ..config import config
+from ..algebra.data_types import MultiVector
+from ..config import ARConfig, config
 from .lexparse import ARContext
+from .serialise import config_record, to_record, write_frame
+from .syntax import AR_Error, free_variables
 
 mvec_pattern = r"([a-zA-Z_][a-zA-Z_0-9]*)\s?=\s?\{(.*)\}$"
 operator_pattern = r"([a-zA-Z_][a-zA-Z_0-9]*)\s?=\s?\<([p0213, -]*)\>$"
@@ -19,7 +41,63 @@ mvec_def = namedtuple("mvec_def", "lnum var alphas")
 operator_def = namedtuple("op_def", "lnum var alphas")
 
 
-def parse_calculation_script(script, default_allowed=config.allowed, default_metric=config.metric):
+def convert_metric(s):
+    if not all([c in "+-" for c in s]):
+        raise RuntimeError("Invalid metric: {}", s)
+
+    metric = [1 if c == "+" else -1 for c in s]
+    return tuple(metric)
+
+
+def parse_sweeps(script):
+    """
+    Find the SWEEP directives in a calculation file and return the overrides
+    for each combination of the swept parameters. Values are separated by
+    spaces apart from ALLOWED where each set of 16 alphas is separated by '|':
+
+        // SWEEP: METRIC +--- -+++
+        // SWEEP: ALLOWED p 23 31 12 0 023 031 012 123 1 2 3 0123 01 02 03 | ...
+        // SWEEP: DIVISION by into
+
+    A script with no SWEEP directives has a single, empty set of overrides.
+    """
+    sweeps = {}
+
+    for lnum, line in enumerate(script, 1):
+        line = line.strip()
+        if not line.startswith("// SWEEP:"):
+            continue
+
+        param, _, values = line.split("// SWEEP:")[1].strip().partition(" ")
+        if param == "METRIC":
+            swept = values.split()
+            invalid = [m for m in swept if len(m) != 4 or not set(m) <= {"+", "-"}]
+        elif param == "ALLOWED":
+            swept = [a.split() for a in values.split("|") if a.strip()]
+            invalid = [" ".join(a) for a in swept if len(a) != 16]
+        elif param == "DIVISION":
+            swept = values.split()
+            invalid = [d for d in swept if d not in ("by", "into")]
+        else:
+            raise ValueError("Line {}: unable to sweep over {}".format(lnum, param))
+
+        if not swept:
+            raise ValueError("Line {}: no values given to sweep {} over".format(lnum, param))
+        if invalid:
+            msg = "Line {}: invalid {} for SWEEP: {}"
+            raise ValueError(msg.format(lnum, param, ", ".join(invalid)))
+
+        if param == "METRIC":
+            swept = [convert_metric(m) for m in swept]
+        sweeps[param.lower()] = swept
+
+    names = list(sweeps)
+    return [dict(zip(names, values)) for values in product(*sweeps.values())]
+
+
+def parse_calculation_script(
+    script, default_allowed=config.allowed, default_metric=config.metric, default_division=None
+):
     """
     Parse the contents of a calculation file and onfigure the ARContext for
     carrying out the calculation.
@@ -27,15 +105,8 @@ def parse_calculation_script(script, default_allowed=config.allowed, default_met
     `script` should be an iterable of valid calcualtion directive lines.
     """
 
-    def convert_metric(s):
-        if not all([c in "+-" for c in s]):
-            raise RuntimeError("Invalid metric: {}", s)
-
-        metric = [1 if c == "+" else -1 for c in s]
-        return tuple(metric)
-
     # Set paramaters to default to start
-    metric, allowed = None, None
+    metric, allowed, division = None, None, None
     lines = []
     modifiers = {}
 
@@ -61,6 +132,17 @@ def parse_calculation_script(script, default_allowed=config.allowed, default_met
             lines.append(comment(lnum, line))
             lines.append(context_update(lnum, "allowed", a))
 
+        elif line.startswith("// DIVISION:"):
+            d = line.split("// DIVISION: ")[1].strip()
+            if division is None:
+                division = d
+            lines.append(comment(lnum, line))
+            lines.append(context_update(lnum, "division", d))
+
+        elif line.startswith("// SWEEP:"):
+            # Handled by parse_sweeps: shown as a comment
+            lines.append(comment(lnum, line))
+
         elif line.startswith("// "):
             action = line[3:].strip()
             modifiers[lnum + 1] = modifier_map[action]
@@ -100,56 +182,541 @@ def parse_calculation_script(script, default_allowed=config.allowed, default_met
         allowed = default_allowed
         lines = [comment(0, "// ALLOWED: " + " ".join(allowed))] + lines
 
-    config.allowed = allowed
-    config.metric = metric
-    context = ARContext(cfg=config)
+    if division is None:
+        division = default_division or config.division_type
+
+    # Each calculation gets its own config so that the global config is untouched
+    context = ARContext(cfg=ARConfig(allowed, metric, division))
     return context, lines, modifiers
 
 
-def run_calculation(script, modifier=""):
+# A step of a calculation that produces a value, along with everything that
+# is needed in order to evaluate it or find it in a cache.
+planned = namedtuple("planned", "line expr reads deps cfg key")
+
+
+class _ArpyNames(Mapping):
+    """
+    Everything that a calculation file could see via `from arpy import *`.
+    Names are only looked up when a step uses them so that the first step
+    does not trigger every one of arpy's lazy imports.
+    """
+
+    def __init__(self):
+        self._names = frozenset(arpy.__all__)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return getattr(arpy, name)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(arpy.__all__)
+
+    def __len__(self):
+        return len(self._names)
+
+
+_arpy_names = _ArpyNames()
+
+
+def _expression(line):
+    """The ar() expression that computes the value of a line (if there is one)"""
+    if isinstance(line, raw):
+        return line.var
+    if isinstance(line, mvec_def):
+        return "{%s}" % " ".join(line.alphas)
+    if isinstance(line, operator_def):
+        return "<{}>".format(" ".join(line.alphas))
+    if isinstance(line, step):
+        return line.args
+    return None
+
+
+# Bump this when the way that results are pickled changes. The arpy version is
+# also part of every key so that results computed by other releases are not
+# re-used.
+CACHE_FORMAT = 1
+
+
+def _step_key(expr, cfg, dep_keys):
+    salt = (arpy.__version__, CACHE_FORMAT)
+    data = repr((salt, expr, cfg.fingerprint, sorted(dep_keys.items())))
+    return blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def apply_modifier(value, modifier):
+    """Apply a modifier such as '.v' or '.simplified().__tex__()' to a result"""
+    for attr in filter(None, modifier.split(".")):
+        if attr.endswith("()"):
+            value = getattr(value, attr[:-2])()
+        else:
+            value = getattr(value, attr)
+
+    return value
+
+
+class StepCache:
     """
-    Run a calculation from a list of calculation lines.
+    Results of calculation steps, keyed on the step keys computed when planning
+    a calculation. Results are held in memory and, if a `path` is given, also
+    pickled to disk so that they can be picked up by later runs. Only the
+    `max_entries` most recently used results are kept in memory (all of them
+    if it is None). Caches can be shared between threads.
+    """
+
+    MISSING = object()
+
+    def __init__(self, path=None, max_entries=None):
+        if path is not None:
+            path = os.path.abspath(os.path.expanduser(path))
+
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"StepCache({self.path!r})"
+
+    def __getstate__(self):
+        # Only the location is sent to worker processes: not everything in memory
+        return {"path": self.path, "max_entries": self.max_entries}
 
-    NOTE: This makes extensive use of eval!
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if self.max_entries is not None and len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + ".pickle")
+
+    def get(self, key):
+        """Look up a result, returning StepCache.MISSING if there isn't one"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if self.path is None:
+            return self.MISSING
+
+        try:
+            with open(self._file(key), "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return self.MISSING
+
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.path is None:
+            return
+
+        path = self._file(key)
+        tmp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # Not everything can be pickled: those results are only kept in memory
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+# Contexts are never modified once in use so they can be shared by every
+# calculation (and every step) that runs under the same config.
+_contexts = {}
+
+
+def _context(fingerprint):
+    ctx = _contexts.get(fingerprint)
+    if ctx is None:
+        ctx = _contexts[fingerprint] = ARContext(cfg=ARConfig.from_fingerprint(fingerprint))
+    return ctx
+
+
+def evaluate_step(fingerprint, expr, defined):
+    """
+    Evaluate the expression for a step under the config with the given
+    fingerprint. `defined` holds the values of the names defined by earlier
+    steps. Returns the value, an error message if the expression could not be
+    evaluated and the time taken in seconds. This only uses picklable
+    arguments so that it can be run in a worker process.
     """
-    context, lines, modifiers = parse_calculation_script(script)
-    output = StringIO()
+    start = time.perf_counter()
+    ctx = _context(fingerprint)
+    # Names resolve in the same order as they would for ar(): the context's
+    # own variables first, then definitions in the file, then arpy itself.
+    bindings = ChainMap(ctx._vars, defined, _arpy_names)
 
-    for l in lines:
-        step_modifier = modifiers.get(l.lnum)
+    try:
+        value, error = ctx.evaluate(expr, bindings), None
+    except AR_Error as e:
+        value, error = None, str(e)
 
-        if isinstance(l, comment):
-            print(l.text, file=output)
+    return value, error, time.perf_counter() - start
 
-        elif isinstance(l, raw):
-            mod = step_modifier if step_modifier else modifier
-            eval("""print('{} = ', context("{}"){}, file=output)""".format(l.var, l.var, mod))
 
-        elif isinstance(l, context_update):
-            # The update will have a matching comment line to show when
-            # it occured in the calculation.
-            if l.param == "metric":
-                context.metric = l.val
-            elif l.param == "allowed":
-                context.allowed = l.val
+class Calculation:
+    """
+    A parsed and planned calculation file. `steps` contains an entry for
+    every line of the calculation: lines that do not produce a value have an
+    expr of None.
+    """
 
-        elif isinstance(l, mvec_def):
-            # exec('{} = MultiVector({})'.format(l.var, l.alphas))
-            exec('%s = context("{%s}")' % (l.var, " ".join(l.alphas)))
-            mod = step_modifier if step_modifier else modifier
-            eval("""print('{} = ', {}{}, file=output)""".format(l.var, l.var, mod))
+    def __init__(self, script, overrides=None):
+        """
+        `overrides` may be used to set any of 'metric', 'allowed' and
+        'division' (see parse_sweeps). A parameter that is overridden can not
+        also be set by a directive in the script.
+        """
+        self.overrides = overrides or {}
+        context, self.lines, self.modifiers = parse_calculation_script(
+            script,
+            self.overrides.get("allowed", config.allowed),
+            self.overrides.get("metric", config.metric),
+            self.overrides.get("division"),
+        )
 
-        elif isinstance(l, operator_def):
-            exec('{} = context("<{}>")'.format(l.var, " ".join(l.alphas)))
-            eval("""print('{} = ', {}, file=output)""".format(l.var, l.var))
+        for line in self.lines:
+            if isinstance(line, context_update) and line.param in self.overrides:
+                raise ValueError(
+                    "Line {}: {} is being swept and can not also be set".format(
+                        line.lnum, line.param
+                    )
+                )
 
-        elif isinstance(l, step):
-            print('{} = context("{}")'.format(l.var, l.args))
-            exec('{} = context("{}")'.format(l.var, l.args))
-            print("{} = {}".format(l.var, l.args), file=output)
-            mod = step_modifier if step_modifier else modifier
-            eval("print({}{}, file=output)".format(l.var, mod))
+        self.steps = self._plan(context)
+        # The line numbers of the steps that were evaluated (rather than being
+        # found in the cache) during the most recent run and how long each took.
+        self.evaluated = []
+        self.timings = {}
+        self.errors = {}
+        # Where errors are reported: sys.stderr unless this is set
+        self.stderr = None
 
-    # Split back into lines and remove the trailing newline so that
-    # the caller can decide how to format the result.
-    return output.getvalue().split("\n")[:-1]
+    def _plan(self, context):
+        steps = []
+        # The key of the most recent step to assign to each name
+        writers = {}
+
+        for line in self.lines:
+            if isinstance(line, context_update):
+                # The update will have a matching comment line to show when
+                # it occured in the calculation.
+                setattr(context, line.param, line.val)
+
+            expr = _expression(line)
+            if expr is None:
+                steps.append(planned(line, None, set(), {}, context.cfg, None))
+                continue
+
+            ctx = _context(context.cfg.fingerprint)
+            try:
+                reads = free_variables(ctx.compile(expr))
+            except AR_Error:
+                reads = set()  # Reported when the step is run
+
+            deps = {name: writers[name] for name in reads if name in writers}
+            key = _step_key(expr, context.cfg, deps)
+            steps.append(planned(line, expr, reads, deps, context.cfg, key))
+
+            if not isinstance(line, raw):
+                writers[line.var] = key
+
+        return steps
+
+    def dependencies(self):
+        """Map the line number of each step to the line numbers it depends on"""
+        lnums = {s.key: s.line.lnum for s in self.steps if s.key is not None}
+        return {
+            s.line.lnum: sorted(lnums[k] for k in s.deps.values())
+            for s in self.steps
+            if s.key is not None
+        }
+
+    def _arguments(self, step, values):
+        defined = {name: values[key] for name, key in step.deps.items()}
+        return step.cfg.fingerprint, step.expr, defined
+
+    def results(self, cache=None, jobs=1):
+        """
+        Yield (step, value) for each step in source order. When jobs > 1,
+        steps are evaluated on a pool of worker processes as soon as the
+        steps that they depend on have finished.
+        Values are only held on to for as long as a later step needs them.
+        """
+        self.evaluated = []
+        self.timings = {}
+        self.errors = {}
+
+        if jobs > 1:
+            yield from self._parallel_results(cache, jobs)
+            return
+
+        values = {}
+        last_uses = self._last_uses()
+
+        for n, s in enumerate(self.steps):
+            if s.key is not None and s.key not in values:
+                value = StepCache.MISSING if cache is None else cache.get(s.key)
+                if value is StepCache.MISSING:
+                    value, error, seconds = evaluate_step(*self._arguments(s, values))
+                    self._evaluated(s, value, error, seconds, cache)
+                values[s.key] = value
+
+            yield s, values.get(s.key)
+            self._release(values, last_uses, n)
+
+    def _last_uses(self):
+        """The position of the last step that needs the value for each key"""
+        last_uses = {}
+        for n, s in enumerate(self.steps):
+            for key in [s.key, *s.deps.values()]:
+                last_uses[key] = n
+        return last_uses
+
+    def _release(self, values, last_uses, n):
+        for key in [self.steps[n].key, *self.steps[n].deps.values()]:
+            if last_uses.get(key) == n:
+                values.pop(key, None)
+
+    def _evaluated(self, step, value, error, seconds, cache):
+        self.evaluated.append(step.line.lnum)
+        self.timings[step.line.lnum] = seconds
+        if error is not None:
+            self.errors[step.line.lnum] = error
+            print(error, file=self.stderr or sys.stderr)
+        elif cache is not None:
+            cache.put(step.key, value)
+
+    def _parallel_results(self, cache, jobs):
+        # Only imported when needed as it noticeably slows down starting up
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        values = {}
+        running = {}
+        waiting = [s for s in self.steps if s.key is not None]
+
+        def start_ready_steps(pool):
+            nonlocal waiting
+            blocked = []
+
+            for s in waiting:
+                if s.key in values or s.key in running:
+                    continue
+                if not all(key in values for key in s.deps.values()):
+                    blocked.append(s)
+                    continue
+
+                value = StepCache.MISSING if cache is None else cache.get(s.key)
+                if value is StepCache.MISSING:
+                    running[s.key] = (s, pool.submit(evaluate_step, *self._arguments(s, values)))
+                else:
+                    values[s.key] = value
+
+            waiting = blocked
+            # Cache hits may have unblocked later steps
+            if any(all(key in values for key in s.deps.values()) for s in waiting):
+                start_ready_steps(pool)
+
+        last_uses = self._last_uses()
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            start_ready_steps(pool)
+
+            for n, s in enumerate(self.steps):
+                while s.key is not None and s.key not in values:
+                    done, _ = wait([f for _, f in running.values()], return_when=FIRST_COMPLETED)
+                    for key, (step, future) in list(running.items()):
+                        if future in done:
+                            del running[key]
+                            values[key], error, seconds = future.result()
+                            self._evaluated(step, values[key], error, seconds, cache)
+
+                    start_ready_steps(pool)
+
+                yield s, values.get(s.key)
+                self._release(values, last_uses, n)
+
+    def run(self, modifier="", cache=None, jobs=1, timings=False):
+        """
+        Run the calculation, yielding formatted output for each line as soon as
+        it is available. If `timings` is True then each result is followed by
+        the time taken to compute it and the number of terms it contains.
+        """
+        for s, value in self.results(cache, jobs):
+            if isinstance(s.line, comment):
+                yield s.line.text
+            elif s.key is not None:
+                output = self.format(s.line, value, modifier)
+                if timings:
+                    output += "\n" + self.annotation(s, value)
+                yield output
+
+    def records(self, cache=None, jobs=1):
+        """
+        Yield (header, value) for each step that produces a value, as soon as
+        it is available. The header describes the step (see `header`) and the
+        value is left unformatted so that it can be serialised.
+        """
+        for s, value in self.results(cache, jobs):
+            if s.key is not None:
+                yield self.header(s), value
+
+    def header(self, step):
+        """A JSON compatible description of a step and how it was computed"""
+        line = step.line
+        return {
+            "line": line.lnum,
+            "var": None if isinstance(line, raw) else line.var,
+            "expr": step.expr,
+            "config": config_record(step.cfg),
+            "seconds": self.timings.get(line.lnum),
+            "cached": line.lnum not in self.timings,
+            "error": self.errors.get(line.lnum),
+        }
+
+    def annotation(self, step, value):
+        """A summary of the cost of computing a step"""
+        seconds = self.timings.get(step.line.lnum)
+        took = "cached" if seconds is None else "{:.3f}s".format(seconds)
+
+        if isinstance(value, MultiVector):
+            return "[{}, {} terms]".format(took, len(value))
+
+        return "[{}]".format(took)
+
+    def format(self, line, value, modifier=""):
+        """Format the result of a step for display"""
+        mod = self.modifiers.get(line.lnum) or modifier
+
+        if isinstance(line, (raw, mvec_def)):
+            return "{} =  {}".format(line.var, apply_modifier(value, mod))
+        if isinstance(line, operator_def):
+            return "{} =  {}".format(line.var, value)
+
+        return "{} = {}\n{}".format(line.var, line.args, apply_modifier(value, mod))
+
+
+def run_calculation(script, modifier="", cache=None, jobs=1):
+    """
+    Run a calculation from a list of calculation lines, returning the lines of
+    output. Pass a StepCache as `cache` to re-use the results of unchanged
+    steps from previous runs and set `jobs` to evaluate independent steps in
+    parallel using that many processes.
+    """
+    output = "\n".join(Calculation(script).run(modifier, cache, jobs))
+    return output.split("\n") if output else []
+
+
+def _run_configuration(script, overrides, modifier, cache, timings):
+    return list(Calculation(script, overrides).run(modifier, cache, timings=timings))
+
+
+def sweep_label(overrides, sweeps):
+    """A short name for one combination of swept parameters"""
+    parts = []
+    for param, value in overrides.items():
+        if param == "metric":
+            value = "".join("+" if m == 1 else "-" for m in value)
+        elif param == "allowed":
+            # The full set is shown by the ALLOWED comment at the top of the output
+            value = "#{}".format([o["allowed"] for o in sweeps].index(value) + 1)
+        parts.append("{}={}".format(param.upper(), value))
+
+    return " ".join(parts)
+
+
+def side_by_side(labels, outputs):
+    """
+    Lay out the output of several runs of the same calculation in columns.
+    Lines that are the same in every run are only shown once.
+    """
+    columns = [[block.split("\n") for block in output] for output in outputs]
+    widths = [
+        max([len(label)] + [len(line) for block in column for line in block])
+        for label, column in zip(labels, columns)
+    ]
+
+    def row(cells):
+        return " │ ".join(cell.ljust(w) for cell, w in zip(cells, widths)).rstrip()
+
+    yield row(labels)
+    yield "─┼─".join("─" * w for w in widths)
+
+    for blocks in zip(*outputs):
+        if all(block == blocks[0] for block in blocks):
+            yield blocks[0]
+            continue
+
+        split = [block.split("\n") for block in blocks]
+        for n in range(max(len(lines) for lines in split)):
+            yield row([lines[n] if n < len(lines) else "" for lines in split])
+
+
+def run_sweep(script, modifier="", cache=None, jobs=1, timings=False):
+    """
+    Run a calculation once for each combination of its SWEEP directives and
+    yield a side by side comparison of the results. When jobs > 1, each
+    combination is run in its own process. `timings` is as for Calculation.run.
+    """
+    sweeps = parse_sweeps(script)
+    labels = [sweep_label(overrides, sweeps) for overrides in sweeps]
+    args = [(script, overrides, modifier, cache, timings) for overrides in sweeps]
+
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outputs = list(pool.map(_run_configuration, *zip(*args)))
+    else:
+        outputs = [_run_configuration(*a) for a in args]
+
+    yield from side_by_side(labels, outputs)
+
+
+def run_script(script, modifier="", cache=None, jobs=1, timings=False, format="text", stderr=None):
+    """
+    Run a calculation in the same way as the CLI, yielding its output as it
+    becomes available. Output is a line of text for each step for the "text"
+    and "jsonl" formats and a frame of bytes for each step for "binary" (see
+    serialise.write_frame). Scripts with SWEEP directives are run once for
+    each configuration: side by side for "text" and one after another for the
+    structured formats.
+    """
+    sweeps = parse_sweeps(script)
+
+    if format == "text" and len(sweeps) > 1:
+        yield from run_sweep(script, modifier, cache, jobs, timings)
+        return
+
+    if format == "text":
+        calculation = Calculation(script)
+        calculation.stderr = stderr
+        yield from calculation.run(modifier, cache, jobs, timings)
+        return
+
+    for overrides in sweeps:
+        calculation = Calculation(script, overrides)
+        calculation.stderr = stderr
+        for header, value in calculation.records(cache, jobs):
+            if format == "jsonl":
+                yield json.dumps({**header, "value": to_record(value)})
+            else:
+                frame = io.BytesIO()
+                write_frame(frame, header, value)
+                yield frame.getvalue()
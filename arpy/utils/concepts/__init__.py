@@ -1,5 +1,17 @@
+from importlib import import_module
+
 from .dispatch import dispatch_on, instance
 from .fmap import fmap_for, on_keys
-from .pattern_match import pattern_match, pattern_matching
 from .prelude import *
 from .tcall import tcall
+
+
+def __getattr__(name):
+    # pattern_match relies on inspect which is slow to import so it is only
+    # loaded when it is first used.
+    if name in ("pattern_match", "pattern_matching"):
+        module = import_module(".pattern_match", __name__)
+        value = globals()[name] = getattr(module, name)
+        return value
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -11,6 +11,9 @@ NOTE:   *args and **kwargs are _not_ allowed in the signature of the
 """
 from functools import wraps
 
+# Every function decorated with dispatch_on (used by arpy.stats)
+DISPATCHERS = []
+
 
 def dispatch_on(index=0, func=None):
     """
@@ -84,8 +87,16 @@ def dispatch_on(index=0, func=None):
         implementation = implementations.get(dispatch_key, func)
         return implementation(*args, **kwargs)
 
+    def set_default(new):
+        """Replace the default implementation"""
+        nonlocal func
+        func = wrapped.default = new
+
     wrapped.implementations = implementations
     wrapped.add = add
+    wrapped.default = func
+    wrapped.set_default = set_default
+    DISPATCHERS.append(wrapped)
     return wrapped
 
 
@@ -0,0 +1,215 @@
+"""
+A long running arpy process that runs calculation files for the CLI.
+
+Starting arpy means importing the package, building the default config and
+every predefined MultiVector and differential operator and then computing
+Cayley tables on first use. That dominates the run time of short scripts so
+the daemon pays for it once: it warms the Cayley tables and parsers for the
+common configs (COMMON_METRICS with each division type) and keeps the
+in-memory layer of each StepCache (up to CACHED_RESULTS results per cache
+directory) between requests.
+
+    $ python -m arpy --serve &
+    $ python -m arpy --daemon calculation.arp
+
+Requests and responses are sent over a Unix socket (see `socket_path`). A
+request is a single line of JSON giving the script and the CLI options. The
+response is a stream of messages, each a kind byte and a u32 length followed
+by that many bytes:
+
+    STDOUT : a line of output (or a frame for the binary format)
+    STDERR : error text for the client to display
+    EXIT   : a single byte exit status; always the last message
+"""
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import traceback
+from itertools import product
+
+from ..algebra.data_types import Alpha
+from ..algebra.operations import find_prod
+from ..config import config
+from .calc_file import StepCache, _context, run_script
+
+STDOUT, STDERR, EXIT = b"o", b"e", b"x"
+MESSAGE = struct.Struct("<cI")
+COMMON_METRICS = ["+---", "-+++"]
+# The number of results that each StepCache keeps in memory between requests
+CACHED_RESULTS = 256
+
+
+def socket_path():
+    """$ARPY_SOCKET or daemon.sock in the arpy cache directory"""
+    if os.environ.get("ARPY_SOCKET"):
+        return os.environ["ARPY_SOCKET"]
+
+    cache_dir = os.environ.get("ARPY_CACHE_DIR") or os.path.expanduser("~/.cache/arpy")
+    return os.path.join(cache_dir, "daemon.sock")
+
+
+def warm(metrics=COMMON_METRICS, divisions=("by", "into")):
+    """Fill find_prod's cache and build a context for each of the given configs"""
+    for metric, div in product(metrics, divisions):
+        cfg = config.derive(metric=metric, div=div)
+        _context(cfg.fingerprint)
+
+        if find_prod.loader is not None and find_prod.loader(cfg):
+            continue
+
+        for i, j in product(cfg.allowed, repeat=2):
+            for si, sj in product([1, -1], repeat=2):
+                find_prod(Alpha(i, si, cfg=cfg), Alpha(j, sj, cfg=cfg), cfg=cfg)
+
+
+def send(stream, kind, payload):
+    stream.write(MESSAGE.pack(kind, len(payload)) + payload)
+    stream.flush()
+
+
+def receive(stream):
+    """Read a single (kind, payload) message, returning None at the end of the stream"""
+    header = stream.read(MESSAGE.size)
+    if len(header) < MESSAGE.size:
+        return None
+
+    kind, length = MESSAGE.unpack(header)
+    return kind, stream.read(length)
+
+
+class _ErrorStream:
+    """A file like object that sends everything written to it to the client"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        send(self.stream, STDERR, text.encode("utf8"))
+
+    def flush(self):
+        pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode("utf8"))
+        status = 0
+
+        try:
+            for chunk in run_script(
+                request["script"],
+                request.get("modifier", ""),
+                self.server.cache(request.get("cache_dir")),
+                request.get("jobs", 1),
+                request.get("timings", False),
+                request.get("format", "text"),
+                stderr=_ErrorStream(self.wfile),
+            ):
+                if isinstance(chunk, str):
+                    chunk = (chunk + "\n").encode("utf8")
+                send(self.wfile, STDOUT, chunk)
+        except BrokenPipeError:
+            return  # The client has gone away
+        except Exception:
+            send(self.wfile, STDERR, traceback.format_exc().encode("utf8"))
+            status = 1
+
+        send(self.wfile, EXIT, bytes([status]))
+
+
+class AlreadyRunning(RuntimeError):
+    """Another daemon is listening on the socket"""
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serve requests from the CLI, each in its own thread. Raises AlreadyRunning
+    if another daemon is using the socket.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self._caches = {}
+        self._caches_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                connect(self.path).close()
+            except ConnectionRefusedError:
+                os.remove(self.path)  # Left behind by a daemon that did not shut down cleanly
+            else:
+                raise AlreadyRunning("An arpy daemon is already listening on " + self.path)
+
+        super().__init__(self.path, _Handler)
+        os.chmod(self.path, 0o600)
+
+    def cache(self, path):
+        """The StepCache for a directory (or None if caching is turned off)"""
+        if path is None:
+            return None
+
+        with self._caches_lock:
+            if path not in self._caches:
+                self._caches[path] = StepCache(path, CACHED_RESULTS)
+            return self._caches[path]
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def serve(path=None, warm_caches=True):
+    """Run a daemon until it is interrupted"""
+    if warm_caches:
+        warm()
+
+    # Make sure that the socket is removed when asked to stop
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+
+    with Daemon(path) as daemon:
+        print("arpy daemon listening on {}".format(daemon.path), file=sys.stderr)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def connect(path=None):
+    """Connect to a running daemon, raising OSError if there isn't one"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def request(sock, script, **options):
+    """
+    Send a script to a daemon using a socket from `connect`, yielding each
+    (kind, payload) message of the response. `options` are passed on to
+    calc_file.run_script apart from `cache_dir` which is the location of the
+    StepCache to use (None to turn off caching).
+    """
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps({"script": script, **options}).encode("utf8") + b"\n")
+        stream.flush()
+
+        while True:
+            message = receive(stream)
+            if message is None:
+                raise ConnectionError("The arpy daemon closed the connection")
+
+            yield message
+            if message[0] == EXIT:
+                return
@@ -0,0 +1,113 @@
+"""
+Swapping instrumented versions of functions into place (and back again).
+
+arpy.stats and arpy.trace only cost something while they are turned on: they
+replace the functions that they measure and then restore the originals. Patches
+records each replacement so that they can all be undone in reverse order.
+
+Instruments may be nested (each wraps whatever is in place when it starts) but
+they must be undone in the reverse order to the one that they were started in:
+otherwise the originals that they restore would remove the wrappers of any that
+are still active.
+"""
+from copy import deepcopy
+from functools import wraps
+
+# Every Patches that has replaced something, in the order that they started
+_active = []
+
+
+class Patches:
+    """A set of replaced attributes and dispatch_on implementations"""
+
+    def __init__(self):
+        self._restore = []
+        if self in _active:
+            _active.remove(self)
+
+    def __bool__(self):
+        return bool(self._restore)
+
+    def _check_nesting(self, action):
+        if self in _active and _active[-1] is not self:
+            raise RuntimeError(
+                "Unable to {} instrumentation while instrumentation that was "
+                "started after it is still active".format(action)
+            )
+
+    def _started(self):
+        self._check_nesting("extend")
+        if self not in _active:
+            _active.append(self)
+
+    def attribute(self, owner, name, value):
+        """Set an attribute of a class or module"""
+        self._started()
+        self._restore.append((owner, name, owner.__dict__.get(name)))
+        setattr(owner, name, value)
+
+    def implementations(self, dispatcher, wrap):
+        """Replace every implementation of a dispatch_on function (and its default)"""
+        self._started()
+        for key, implementation in list(dispatcher.implementations.items()):
+            dispatcher.implementations[key] = wrap(key, implementation)
+            self._restore.append((dispatcher.implementations, key, implementation))
+
+        default = dispatcher.default
+        dispatcher.set_default(wrap(None, default))
+        self._restore.append((dispatcher, None, default))
+
+    def undo(self):
+        """Restore everything that was replaced, raising RuntimeError if nested incorrectly"""
+        self._check_nesting("stop")
+        for owner, name, original in reversed(self._restore):
+            if isinstance(owner, dict):
+                owner[name] = original
+            elif name is None:
+                owner.set_default(original)
+            elif original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+
+        self._restore = []
+        if self in _active:
+            _active.remove(self)
+
+
+def implementation_name(dispatcher, key):
+    """The name of a dispatch_on implementation, e.g. 'full(Term, Term)'"""
+    if key is None:
+        return "{}(default)".format(dispatcher.__name__)
+
+    types = key if isinstance(key, tuple) else (key,)
+    return "{}({})".format(dispatcher.__name__, ", ".join(t.__name__ for t in types))
+
+
+def on_allocation(patches, cls, callback):
+    """
+    Call callback(obj) each time an instance of cls is created, including by
+    copy and deepcopy (which create objects without calling __init__).
+    """
+    init = cls.__init__
+
+    @wraps(init)
+    def __init__(obj, *args, **kwargs):
+        init(obj, *args, **kwargs)
+        callback(obj)
+
+    def __copy__(obj):
+        new = object.__new__(type(obj))
+        new.__dict__.update(obj.__dict__)
+        callback(new)
+        return new
+
+    def __deepcopy__(obj, memo):
+        new = memo[id(obj)] = object.__new__(type(obj))
+        new.__dict__.update(deepcopy(obj.__dict__, memo))
+        callback(new)
+        return new
+
+    patches.attribute(cls, "__init__", __init__)
+    patches.attribute(cls, "__copy__", __copy__)
+    patches.attribute(cls, "__deepcopy__", __deepcopy__)
@@ -6,16 +6,33 @@ Lexing and Parsing of a more mathematical syntax for performing calculations
 with the arpy Absolute Relativity library.
 """
 import re
-from collections import namedtuple
+import sys
+from collections import OrderedDict, namedtuple
+from copy import copy
+from functools import partial
 from itertools import permutations
-from operator import add
-from sys import _getframe, stderr
+from threading import Lock
 
-from ..algebra.data_types import Alpha, MultiVector, Term
+from ..algebra.budget import Budget
+from ..algebra.data_types import MultiVector
 from ..algebra.differential import AR_differential
-from ..algebra.operations import commutator, dagger, div_by, div_into, full, project
 from ..config import ARConfig
 from ..config import config as cfg
+from .optimise import optimise
+from .syntax import (
+    AlphaLit,
+    AR_Error,
+    BinOp,
+    Commutator,
+    Dagger,
+    DiffLit,
+    MVecLit,
+    Neg,
+    Project,
+    TermLit,
+    Var,
+    evaluate,
+)
 
 tags = [
     ("MVEC", r"\{(.*)\}$"),
@@ -49,201 +66,297 @@ _tags = "|".join("(?P<{}>{})".format(t[0], t[1]) for t in tags + literals)
 Token = namedtuple("token", ["tag", "val"])
 
 
-class AR_Error(Exception):
-    pass
-
-
 class ArpyLexer:
     tags = re.compile(_tags)
     literals = [tag_regex[0] for tag_regex in literals]
 
-    def __init__(self, cfg=cfg, _globals=None):
-        self._globals = _globals
+    def __init__(self, cfg=cfg):
         self.cfg = cfg
-        self.context_vars = {}
 
-    def lex(self, string, context_vars=None):
+    def tokenize(self, string):
+        """
+        Lex the input into a list of Tokens. Literals and variables become
+        "EXPR" tokens holding the syntax tree node that they represent.
+        """
         string = re.sub(" \t\n", "", string)  # remove whitespace
-        matched_text = []
-
-        if context_vars:
-            self.context_vars = context_vars
+        tokens = []
 
         for match in re.finditer(self.tags, string):
             lex_tag = match.lastgroup
             group = [g for g in match.groups() if g is not None]
             text = group[1] if len(group) == 2 else match.group(lex_tag)
-            matched_text.append(text)
 
             if lex_tag == "MVEC":
-                alphas = re.split(", |,| ", text.strip())
-                token = Token("EXPR", MultiVector(alphas, cfg=self.cfg))
+                token = Token("EXPR", MVecLit(tuple(re.split(", |,| ", text.strip()))))
 
             elif lex_tag == "DIFF":
-                alphas = re.split(", |,| ", text.strip())
-                token = Token("EXPR", AR_differential(alphas, cfg=self.cfg))
+                token = Token("EXPR", DiffLit(tuple(re.split(", |,| ", text.strip()))))
 
             elif lex_tag == "ALPHA":
                 if text.startswith("-"):
-                    token = Token("EXPR", Alpha(text[2:], -1, cfg=self.cfg))
+                    token = Token("EXPR", AlphaLit(text[2:], -1))
                 else:
-                    token = Token("EXPR", Alpha(text[1:], cfg=self.cfg))
+                    token = Token("EXPR", AlphaLit(text[1:]))
 
             elif lex_tag == "TERM":
                 if text.startswith("-"):
-                    token = Token("EXPR", Term(Alpha(text[2:], -1, cfg=self.cfg), cfg=self.cfg))
+                    token = Token("EXPR", TermLit(text[2:], -1))
                 else:
-                    token = Token("EXPR", Term(Alpha(text[1:], cfg=self.cfg), cfg=self.cfg))
+                    token = Token("EXPR", TermLit(text[1:]))
 
             elif lex_tag == "INDEX":
                 token = Token("INDEX", int(text))
 
             elif lex_tag == "VAR":
-                is_negated = False
                 if text.startswith("-"):
-                    is_negated = True
-                    text = text[1:]
-                try:
-                    # Use definitions from the context over the global values
-                    val = eval(text, self.context_vars)
-                except NameError:
-                    try:
-                        val = eval(text, self._globals)
-                    except Exception:
-                        stderr.write('"{}" is not currently defined\n'.format(text))
-                        raise AR_Error()
-
-                token = Token("EXPR", -val if is_negated else val)
+                    token = Token("EXPR", Neg(Var(text[1:])))
+                else:
+                    token = Token("EXPR", Var(text))
 
             elif lex_tag in self.literals:
                 token = Token(lex_tag, text)
 
             else:
-                message = "Input contains invalid syntax for the ar() function: {}\n"
-                stderr.write(message.format(text))
-                raise AR_Error()
+                message = "Input contains invalid syntax for the ar() function: {}"
+                raise AR_Error(message.format(text))
+
+            tokens.append(token)
+
+        return tokens
+
+
+class _TokenStream:
+    """Cursor over a list of tokens: kept separate from the parser for thread safety"""
+
+    def __init__(self, tokens, raw_text):
+        self.tokens = tokens
+        self.raw_text = raw_text
+        self.pos = 0
+
+    @property
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    def peek(self):
+        return self.tokens[self.pos]
 
-            yield token
+    def next(self, context="input"):
+        if self.done:
+            raise AR_Error('Unexpected end of {} in "{}"'.format(context, self.raw_text))
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, tag, context):
+        token = self.next(context)
+        if token.tag != tag:
+            msg = 'Expected {} but found "{}" in {} in "{}"'
+            raise AR_Error(msg.format(tag, token.val, context, self.raw_text))
+        return token
 
 
 class ArpyParser:
-    unops_postfix = {"DAG": dagger}
-    binops = {"FULL": full, "BY": div_by, "INTO": div_into, "PLUS": add}
+    """
+    Precedence climbing (Pratt) parser producing an immutable syntax tree
+    (see syntax.py). From loosest to tightest binding:
+
+        a + b, a - b              left associative
+        a ^ b, a / b, a \\ b      right associative
+        a b                       left associative (juxtaposition is ^)
+        -a                        prefix negation
+        a!                        postfix Hermitian conjugate
+
+    As in earlier versions of arpy, a / b / c is a / (b / c) and a differential
+    applies to everything on its right, so DF ^ G ^ F is DF ^ (G ^ F) while
+    DF G F is (DF G) F.
+
+    Parenthesised expressions, <a>n projections and [a, b] commutators are
+    all parsed as single operands.
+    """
+
+    binding_powers = {"PLUS": 10, "MINUS": 10, "FULL": 20, "BY": 20, "INTO": 20}
+    right_associative = {"FULL", "BY", "INTO"}
+    juxtaposition = 25
+    prefix = 30
+    operand_tags = {"EXPR", "PAREN_OPEN", "ANGLE_OPEN", "SQUARE_OPEN"}
 
     def __init__(self, cfg=cfg):
         self.cfg = cfg
-        self.context_vars = {}
-
-    def sub_expr(self, tokens, deliminator_tag):
-        """Pull tokens until we hit the specified deliminator."""
-        token = next(tokens)
-        sub_expression = []
-        while token.tag != deliminator_tag:
-            try:
-                sub_expression.append(token)
-                token = next(tokens)
-            except StopIteration:
-                message = 'Invalid subexpression: missing "{}"\n'
-                stderr.write(message.format(deliminator_tag))
-                raise AR_Error()
-        return (s for s in sub_expression)
-
-    def parse(self, tokens, raw_text, compound=[], context_vars=None):
-        """Naive recursive decent parsing of the input."""
-        previous_token = None
-
-        try:
-            while True:
-                token = next(tokens)
-
-                if token.tag == "PAREN_OPEN":
-                    sub_expression = self.sub_expr(tokens, "PAREN_CLOSE")
-                    sub_expr_token = self.parse(sub_expression, raw_text)
-                    if previous_token:
-                        val = full(previous_token.val, sub_expr_token.val, cfg=self.cfg)
-                        previous_token = Token("EXPR", val)
-                    else:
-                        previous_token = sub_expr_token
-
-                elif token.tag == "EXPR":
-                    if previous_token:
-                        # default to forming the full product
-                        val = full(previous_token.val, token.val, cfg=self.cfg)
-                        previous_token = Token("EXPR", val)
-                    else:
-                        # Store the token and then check the next token to
-                        # determine what we should do next.
-                        previous_token = token
-
-                elif token.tag in self.binops:
-                    if previous_token is None:
-                        msg = 'Missing left argument to "{}" in "{}"\n'
-                        stderr.write(msg.format(token.val, raw_text))
-                        raise AR_Error()
-                    else:
-                        LHS, previous_token = previous_token, None
-                        op = self.binops.get(token.tag)
-                        RHS = self.parse(tokens, raw_text)
-                        if RHS is None:
-                            err = 'Missing right argument to "{}" in "{}"\n'
-                            stderr.write(err.format(token.val, raw_text))
-                            raise AR_Error()
-                        if RHS.tag != "EXPR":
-                            # BinaryOps take a single LHS and RHS expression
-                            msg = "Invalid argument for {}: {}\n"
-                            stderr.write(msg.format(token.val, RHS.val))
-                            raise AR_Error()
-                        else:
-                            if token.tag == "PLUS":
-                                val = op(LHS.val, RHS.val)
-                            else:
-                                val = op(LHS.val, RHS.val, cfg=self.cfg)
-                            previous_token = Token("EXPR", val)
-
-                elif token.tag in self.unops_postfix:
-                    if previous_token is None:
-                        msg = 'Missing argument to "{}" in "{}"\n'
-                        stderr.write(msg.format(token.val, raw_text))
-                        raise AR_Error()
-                    else:
-                        LHS, previous_token = previous_token, None
-                        op = self.unops_postfix.get(token.tag)
-                        val = op(LHS.val, cfg=self.cfg)
-                        previous_token = Token("EXPR", val)
-
-                elif token.tag == "ANGLE_OPEN":
-                    sub_expression = self.sub_expr(tokens, "ANGLE_CLOSE")
-                    arg = self.parse(sub_expression, raw_text)
-
-                    index = next(tokens)
-                    if index.tag != "INDEX":
-                        msg = "Missing index for projection: {}\n"
-                        stderr.write(msg.format(raw_text))
-                        raise AR_Error()
-                    else:
-                        val = project(arg.val, index.val)
-                        previous_token = Token("EXPR", val)
-
-                elif token.tag == "SQUARE_OPEN":
-                    sub_expression = self.sub_expr(tokens, "COMMA")
-                    LHS = self.parse(sub_expression, raw_text)
-                    sub_expression = self.sub_expr(tokens, "SQUARE_CLOSE")
-                    RHS = self.parse(sub_expression, raw_text)
-                    val = commutator(LHS.val, RHS.val)
-                    previous_token = Token("EXPR", val)
 
-                else:
-                    stderr.write("Invalid input: {}\n".format(raw_text))
-                    return None
+    def parse(self, tokens, raw_text):
+        """Parse a list of tokens into a syntax tree, raising AR_Error if invalid"""
+        stream = _TokenStream(list(tokens), raw_text)
+        if stream.done:
+            raise AR_Error("Unable to parse input: {}".format(raw_text))
+
+        node = self._expression(stream, 0)
+        if not stream.done:
+            token = stream.peek()
+            raise AR_Error('Unexpected "{}" in "{}"'.format(token.val, raw_text))
+
+        return node
+
+    def _expression(self, stream, min_power):
+        lhs = self._operand(stream)
+
+        while not stream.done:
+            token = stream.peek()
+
+            if token.tag == "DAG":
+                stream.next()
+                lhs = Dagger(lhs)
+
+            elif token.tag in self.binding_powers:
+                power = self.binding_powers[token.tag]
+                if power <= min_power:
+                    break
+                stream.next()
+                if token.tag in self.right_associative:
+                    power -= 1
+                rhs = self._expression(stream, power)
+                lhs = BinOp(token.tag, lhs, rhs)
+
+            elif token.tag in self.operand_tags:
+                if self.juxtaposition <= min_power:
+                    break
+                rhs = self._expression(stream, self.juxtaposition)
+                lhs = BinOp("FULL", lhs, rhs)
 
-        except StopIteration:
-            if previous_token:
-                return previous_token
             else:
-                stderr.write("Unable to parse input: {}\n".format(raw_text))
-                return None
-        except AR_Error:
-            return None
+                break
+
+        return lhs
+
+    def _operand(self, stream):
+        token = stream.next("expression")
+
+        if token.tag == "EXPR":
+            return token.val
+
+        elif token.tag == "PAREN_OPEN":
+            node = self._expression(stream, 0)
+            stream.expect("PAREN_CLOSE", "parenthesised expression")
+            return node
+
+        elif token.tag == "ANGLE_OPEN":
+            node = self._expression(stream, 0)
+            stream.expect("ANGLE_CLOSE", "projection")
+            index = stream.expect("INDEX", "projection")
+            return Project(node, index.val)
+
+        elif token.tag == "SQUARE_OPEN":
+            lhs = self._expression(stream, 0)
+            stream.expect("COMMA", "commutator")
+            rhs = self._expression(stream, 0)
+            stream.expect("SQUARE_CLOSE", "commutator")
+            return Commutator(lhs, rhs)
+
+        elif token.tag == "MINUS":
+            return Neg(self._expression(stream, self.prefix))
+
+        msg = 'Missing argument before "{}" in "{}"'
+        raise AR_Error(msg.format(token.val, stream.raw_text))
+
+
+def _columns_to_rows(columns):
+    """Convert a dict of equal length columns into a list of dicts"""
+    lengths = {name: len(col) for name, col in columns.items()}
+    if len(set(lengths.values())) > 1:
+        raise ValueError("Binding columns must all be the same length: {}".format(lengths))
+
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def _standard_vars(cfg):
+    """The variables that are defined in every context"""
+    # Check that we have a (roughly) valid set of values
+    _h = [a for a in cfg.allowed if len(a) == 3 and "0" not in a]
+    assert len(_h) == 1, "h is a single element: {}".format(_h)
+    _h = _h[0]
+    _q = [a for a in cfg.allowed if len(a) == 4]
+    assert len(_q) == 1, "q is a single element: {}".format(_q)
+    _q = _q[0]
+    _B = [a for a in cfg.allowed if len(a) == 2 and "0" not in a]
+    assert len(_B) == 3, "B is a 3-vector: {}".format(_B)
+    _T = [a for a in cfg.allowed if len(a) == 3 and "0" in a]
+    assert len(_T) == 3, "T is a 3-vector: {}".format(_T)
+    _A = [a for a in cfg.allowed if len(a) == 1 and a not in "p0"]
+    assert len(_A) == 3, "A is a 3-vector: {}".format(_A)
+    _E = [a for a in cfg.allowed if len(a) == 2 and "0" in a]
+    assert len(_E) == 3, "E is a 3-vector: {}".format(_E)
+
+    return {
+        # Multivectors
+        "h": MultiVector(_h, cfg=cfg),
+        "q": MultiVector(_q, cfg=cfg),
+        "B": MultiVector(_B, cfg=cfg),
+        "E": MultiVector(_E, cfg=cfg),
+        "F": MultiVector(_E + _B, cfg=cfg),
+        "T": MultiVector(_T, cfg=cfg),
+        "G": MultiVector(cfg.allowed, cfg=cfg),
+        "zet_B": MultiVector(["p"] + _B, cfg=cfg),
+        "zet_T": MultiVector(["0"] + _T, cfg=cfg),
+        "zet_A": MultiVector([_h] + _A, cfg=cfg),
+        "zet_E": MultiVector([_q] + _E, cfg=cfg),
+        "Fp": MultiVector(["p"] + _B + _E, cfg=cfg),
+        "zet_F": MultiVector(["p"] + _B + [_q] + _E, cfg=cfg),
+        # Differentials
+        "Dmu": AR_differential(["0", "1", "2", "3"], cfg=cfg),
+        "DG": AR_differential(cfg.allowed, cfg=cfg),
+        "DF": AR_differential(_B + _E, cfg=cfg),
+        "DB": AR_differential(["p"] + _B, cfg=cfg),
+        "DT": AR_differential(["0"] + _T, cfg=cfg),
+        "DA": AR_differential([_h] + _A, cfg=cfg),
+        "DE": AR_differential([_q] + _E, cfg=cfg),
+    }
+
+
+# Everything a context needs for a given config that never changes once it has
+# been built. These are kept in a registry keyed on the config's fingerprint so
+# that creating a context for a config that has been seen before is cheap.
+_shared = namedtuple("_shared", "lexer parser variables")
+_registry = {}
+_registry_lock = Lock()
+# The number of configs to keep shared state for
+REGISTRY_SIZE = 128
+
+
+def _remember(cache, key, value):
+    with _registry_lock:
+        if key not in cache and len(cache) >= REGISTRY_SIZE:
+            del cache[next(iter(cache))]
+        return cache.setdefault(key, value)
+
+
+def _shared_state(cfg):
+    """The (read only) state shared by every context using an equivalent config"""
+    key = cfg.fingerprint
+    shared = _registry.get(key)
+    if shared is None:
+        # The variables get their own copy of the config as it may be modified
+        # by whoever owns it, while the variables must stay as they are.
+        private = cfg.derive()
+        shared = _shared(ArpyLexer(cfg=private), ArpyParser(cfg=private), _standard_vars(private))
+        shared = _remember(_registry, key, shared)
+    return shared
+
+
+# Contexts used to evaluate expressions in worker processes, keyed on the
+# settings of the context that submitted the work.
+_worker_contexts = {}
+
+
+def _evaluate_in_worker(settings, optimise, text, bindings, cancel_terms, limits):
+    """Evaluate an expression on behalf of an ARContext in another process"""
+    ctx = _worker_contexts.get(settings)
+
+    if ctx is None:
+        ctx = _worker_contexts[settings] = ARContext(cfg=ARConfig.from_fingerprint(settings))
+
+    ctx.optimise = optimise
+    budget = None if limits is None else Budget(*limits)
+    return ctx.evaluate(text, bindings, cancel_terms=cancel_terms, budget=budget)
 
 
 class ARContext:
@@ -256,60 +369,48 @@ class ARContext:
     >>> α31
     """
 
+    # The number of compiled expressions to keep around for re-use
+    cache_size = 512
+    # Set to False to evaluate expressions exactly as they were parsed
+    optimise = True
+    # The concurrent.futures executor used by aeval and amap. None uses the
+    # event loop's default (thread pool) executor.
+    executor = None
+
     def __init__(self, allowed=None, metric=None, div=None, cfg=None, print_all=False):
         self._print = print_all
         if cfg is None:
             cfg = ARConfig(allowed, metric, div)
-        self.cfg = cfg
-        self._lexer = ArpyLexer(cfg=cfg)
-        self._parser = ArpyParser(cfg=cfg)
-        self._initialise_vars()
+        self._compiled = OrderedDict()
+        self._compile_lock = Lock()
+        self._configure(cfg)
 
     def __repr__(self):
         return str(self.cfg)
 
-    def _initialise_vars(self):
-        """Set all of the standard variables"""
-        # Check that we have a (roughly) valid set of values
-        _h = [a for a in self.cfg.allowed if len(a) == 3 and "0" not in a]
-        assert len(_h) == 1, "h is a single element: {}".format(_h)
-        _h = _h[0]
-        _q = [a for a in self.cfg.allowed if len(a) == 4]
-        assert len(_q) == 1, "q is a single element: {}".format(_q)
-        _q = _q[0]
-        _B = [a for a in self.cfg.allowed if len(a) == 2 and "0" not in a]
-        assert len(_B) == 3, "B is a 3-vector: {}".format(_B)
-        _T = [a for a in self.cfg.allowed if len(a) == 3 and "0" in a]
-        assert len(_T) == 3, "T is a 3-vector: {}".format(_T)
-        _A = [a for a in self.cfg.allowed if len(a) == 1 and a not in "p0"]
-        assert len(_A) == 3, "A is a 3-vector: {}".format(_A)
-        _E = [a for a in self.cfg.allowed if len(a) == 2 and "0" in a]
-        assert len(_E) == 3, "E is a 3-vector: {}".format(_E)
-
-        self._vars = {
-            # Multivectors
-            "h": MultiVector(_h, cfg=self.cfg),
-            "q": MultiVector(_q, cfg=self.cfg),
-            "B": MultiVector(_B, cfg=self.cfg),
-            "E": MultiVector(_E, cfg=self.cfg),
-            "F": MultiVector(_E + _B, cfg=self.cfg),
-            "T": MultiVector(_T, cfg=self.cfg),
-            "G": MultiVector(self.cfg.allowed, cfg=self.cfg),
-            "zet_B": MultiVector(["p"] + _B, cfg=self.cfg),
-            "zet_T": MultiVector(["0"] + _T, cfg=self.cfg),
-            "zet_A": MultiVector([_h] + _A, cfg=self.cfg),
-            "zet_E": MultiVector([_q] + _E, cfg=self.cfg),
-            "Fp": MultiVector(["p"] + _B + _E, cfg=self.cfg),
-            "zet_F": MultiVector(["p"] + _B + [_q] + _E, cfg=self.cfg),
-            # Differentials
-            "Dmu": AR_differential(["0", "1", "2", "3"], cfg=self.cfg),
-            "DG": AR_differential(self.cfg.allowed, cfg=self.cfg),
-            "DF": AR_differential(_B + _E, cfg=self.cfg),
-            "DB": AR_differential(["p"] + _B, cfg=self.cfg),
-            "DT": AR_differential(["0"] + _T, cfg=self.cfg),
-            "DA": AR_differential([_h] + _A, cfg=self.cfg),
-            "DE": AR_differential([_q] + _E, cfg=self.cfg),
-        }
+    def _configure(self, cfg):
+        """
+        Switch to a new config. Contexts never modify their config as it may be
+        shared with other contexts (possibly running in other threads): changes
+        to the metric, allowed or Xi dependencies always create a new config.
+        """
+        shared = _shared_state(cfg)
+        self.cfg = cfg
+        self._lexer = shared.lexer
+        self._parser = shared.parser
+        # Copied so that variables can be set on this context alone
+        self._vars = dict(shared.variables)
+
+    def clone(self):
+        """
+        Create a new context with the same config and settings as this one.
+        The clone gets its own copy of the config but everything that depends
+        on it (including compiled expressions) is shared so this is very cheap.
+        """
+        clone = copy(self)
+        clone.cfg = self.cfg.derive()
+        clone._vars = dict(self._vars)
+        return clone
 
     @property
     def metric(self):
@@ -328,7 +429,7 @@ class ARContext:
         else:
             raise TypeError("metric must be comprised of +/- only")
 
-        self.cfg.metric = metric
+        self._configure(self.cfg.derive(metric=metric))
 
     @property
     def allowed(self):
@@ -336,20 +437,54 @@ class ARContext:
 
     @allowed.setter
     def allowed(self, allowed):
-        if len(allowed) != 16:
-            raise ValueError("Must provide all 16 elements for allowed")
+        self._configure(self.cfg.derive(allowed=allowed))
 
-        self.cfg.allowed = allowed
-        self._initialise_vars()
+    @property
+    def division(self):
+        return self.cfg.division_type
+
+    @division.setter
+    def division(self, div):
+        if div not in ["by", "into"]:
+            raise ValueError('division must be either "by" or "into"')
+
+        self._configure(self.cfg.derive(div=div))
+
+    def depends(self, xis, on):
+        """
+        Declare the coordinates (alpha indices) that a set of Xis depend on so
+        that differentiating them with respect to anything else gives zero.
+        Xis can be given as a space separated string of Xi values or as a
+        MultiVector, and `on` as a space separated string or list of indices:
+
+        >>> ar.depends("23 31 12", on="0")        # B depends on t only
+        >>> ar.depends(ar("E"), on="1 2")         # E is planar in x,y
+        >>> ar.depends("p", on="")                # ξp is a constant
+        >>> ar.depends("0123", on="1 2 3")        # ξq is static
+        """
+        if isinstance(xis, MultiVector):
+            xis = [c.val for t in xis for c in t._components]
+        elif isinstance(xis, str):
+            xis = xis.split()
+
+        if isinstance(on, str):
+            on = on.split()
+
+        invalid = [ix for ix in on if ix not in self.cfg.allowed]
+        if invalid:
+            raise ValueError("Invalid indices for dependencies: {}".format(invalid))
+
+        cfg = self.cfg.derive()
+        for xi in xis:
+            cfg.xi_dependencies[xi] = frozenset(on)
+
+        self._configure(cfg)
 
     def decompose(self):
         """Decompose the algebra into Zets"""
-        # Bring the component definitions into scope
-        self.cfg.update_env()
-
         # Define the additional components required
-        quedgehog = "a{}".format([p for p in self.cfg.q][0].index)
-        hedgehog = "a{}".format([p for p in self.cfg.h][0].index)
+        quedgehog = "a{}".format([p for p in self._vars["q"]][0].index)
+        hedgehog = "a{}".format([p for p in self._vars["h"]][0].index)
         bases = (
             ("zet_{}", "ζ"),
             ("(zet_{}!)", "ζ†"),
@@ -395,32 +530,176 @@ class ARContext:
             print(decomp)
         print("-" * 20)
 
-    def __call__(self, text, *, cancel_terms=False):
+    def compile(self, text):
+        """
+        Parse an expression into a syntax tree, re-using the result of any
+        previous call with the same text and config. Only the `cache_size`
+        most recently used expressions are kept.
+        The tree is passed through the optimiser (see optimise.py) unless
+        `optimise` has been set to False.
+        """
+        cfg, lexer, parser = self.cfg, self._lexer, self._parser
+        key = (text, cfg.fingerprint, self.optimise)
+        with self._compile_lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+
+        if compiled is None:
+            compiled = parser.parse(lexer.tokenize(text), text)
+            if self.optimise:
+                compiled = optimise(compiled, cfg)
+
+            with self._compile_lock:
+                self._compiled[key] = compiled
+                if len(self._compiled) > self.cache_size:
+                    self._compiled.popitem(last=False)
+
+        return compiled
+
+    def _run(self, tree, scopes, cancel_terms, budget=None):
+        if budget is None:
+            result = evaluate(tree, scopes, self.cfg)
+        else:
+            with budget.active():
+                result = evaluate(tree, scopes, self.cfg)
+
+        if cancel_terms and isinstance(result, MultiVector):
+            # The result may be one of the shared standard variables (or a
+            # binding) so it must not be modified in place.
+            result = copy(result).cancel_terms()
+
+        return result
+
+    def evaluate(self, text, bindings=None, *, cancel_terms=False, budget=None):
+        """
+        Evaluate an expression without looking at the calling scope: names are
+        resolved using `bindings` (a dict) and then the variables defined by
+        this context. Unlike calling the context directly, errors are raised
+        as AR_Error rather than being printed.
+        """
+        scopes = [self._vars] if bindings is None else [bindings, self._vars]
+        return self._run(self.compile(text), scopes, cancel_terms, budget)
+
+    def map(self, text, bindings, *, lazy=False, cancel_terms=False, budget=None):
+        """
+        Evaluate a single expression for each set of variable bindings. The
+        expression is compiled once and `bindings` may either be an iterable
+        of dicts or a dict of equal length columns:
+
+        >>> ar.map("A ^ B!", [{"A": a1, "B": b1}, {"A": a2, "B": b2}])
+        >>> ar.map("A ^ B!", {"A": [a1, a2], "B": [b1, b2]})
+
+        Results are returned as a list in the same order as the bindings, or
+        as a generator if `lazy` is True. A `budget` applies to each evaluation
+        individually.
+        """
+        tree = self.compile(text)
+
+        if isinstance(bindings, dict):
+            bindings = _columns_to_rows(bindings)
+
+        results = (
+            self._run(tree, [binding, self._vars], cancel_terms, budget) for binding in bindings
+        )
+
+        return results if lazy else list(results)
+
+    async def _offload(self, text, bindings, cancel_terms, budget):
+        """Run an evaluation in the executor, stopping it if we are cancelled"""
+        # Both are slow to import and only needed by the async API
+        import asyncio
+        from concurrent.futures import ProcessPoolExecutor
+
+        loop = asyncio.get_running_loop()
+
+        if isinstance(self.executor, ProcessPoolExecutor):
+            # The context itself stays in this process: workers build their own
+            # from the config (see _evaluate_in_worker). Only the limits of the
+            # budget are sent as it can not be cancelled from here.
+            settings = self.cfg.fingerprint
+            limits = None if budget is None else (budget.max_terms, budget.max_seconds)
+            call = partial(
+                _evaluate_in_worker, settings, self.optimise, text, bindings, cancel_terms, limits
+            )
+            budget = None
+        else:
+            # Evaluations in a thread can only be stopped via their budget
+            budget = Budget() if budget is None else budget.child()
+            call = partial(self.evaluate, text, bindings, cancel_terms=cancel_terms, budget=budget)
+
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        except asyncio.CancelledError:
+            if budget is not None:
+                budget.cancel()
+            raise
+
+    async def aeval(self, text, bindings=None, *, cancel_terms=False, budget=None):
+        """
+        Evaluate an expression in `executor` without blocking the event loop.
+        As with `evaluate`, variables are bound using a dict:
+
+        >>> await ar.aeval("A ^ B!", {"A": a1, "B": b1})
+
+        Cancelling the call cancels the evaluation. Evaluations that are
+        already running in a thread stop at their next budget check.
+        NOTE:: An evaluation that is running in another process will run to
+               completion.
+        """
+        self.compile(text)  # Report syntax errors without a round trip
+        return await self._offload(text, bindings, cancel_terms, budget)
+
+    async def amap(self, text, bindings, *, concurrency=None, cancel_terms=False, budget=None):
+        """
+        The async version of `map`: results are returned in the same order as
+        the bindings. At most `concurrency` evaluations are submitted to the
+        executor at a time. If any evaluation fails, or amap itself is
+        cancelled, then all remaining evaluations are cancelled.
+        """
+        import asyncio
+
+        self.compile(text)
+
+        if isinstance(bindings, dict):
+            bindings = _columns_to_rows(bindings)
+
+        limit = asyncio.Semaphore(concurrency) if concurrency else None
+
+        async def evaluate_one(binding):
+            if limit is None:
+                return await self._offload(text, binding, cancel_terms, budget)
+
+            async with limit:
+                return await self._offload(text, binding, cancel_terms, budget)
+
+        tasks = [asyncio.ensure_future(evaluate_one(b)) for b in bindings]
+
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def __call__(self, text, *, cancel_terms=False, budget=None):
         # NOTE:: The following is a horrible hack that allows you to
         #        inject local variables into the parser.
-        stack_frame = _getframe(1)
-        self._lexer._globals = stack_frame.f_locals
+        stack_frame = sys._getframe(1)
+        scopes = [self._vars, stack_frame.f_locals, stack_frame.f_globals]
 
         try:
-            result = self._parser.parse(self._lexer.lex(text, context_vars=self._vars), text)
-        except AR_Error:
+            result = self._run(self.compile(text), scopes, cancel_terms, budget)
+        except AR_Error as e:
+            print(e, file=sys.stderr)
             return None
 
-        if result:
-            # Result is an internal Token so pull of the value for returning
-            # If there was an error we have printed the error and returned None
-            result = result.val
-            if cancel_terms and isinstance(result, MultiVector):
-                result.cancel_terms()
-
-            if self._print:
-                print('"{}": {}'.format(text, result))
+        if self._print:
+            print('"{}": {}'.format(text, result))
 
-            return result
+        return result
 
     # Allow ARContext to be used as a context manager
     def __enter__(self):
-        self.cfg.update_env()
         return self
 
     def __exit__(self, *args):
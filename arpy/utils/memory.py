@@ -0,0 +1,231 @@
+"""
+Find out which operations and calculation steps use the most memory.
+
+    >>> from arpy import ar, profile_memory
+    >>> with profile_memory() as profile:
+    ...     ar("G ^ G ^ G")
+    >>> print(profile.report())
+
+While the profile is active, tracemalloc measures the memory allocated by
+each dispatch_on implementation (see arpy.stats for how they are named) and
+by each step of a .arp calculation file. Each is recorded with:
+
+    calls     : the number of times that it ran
+    allocated : bytes still allocated when it returned (summed over calls)
+    peak      : the most memory that a single call needed above what was
+                allocated when it started (before Python 3.9 this is only
+                sampled when operations start and finish as tracemalloc can
+                not reset its peak)
+    objects   : the number of Alphas, Xis, Terms and MultiVectors created
+
+Figures are inclusive: a step includes the operations that it runs. Steps
+also record the lines of code responsible for most of their allocations, from
+tracemalloc snapshots taken before and after the step. Snapshots are too slow
+to take around every operation so operations only record the totals above.
+
+Profiling slows calculations down considerably and only measures the current
+process.
+"""
+import copy
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+
+from . import calc_file, instrument
+from .concepts.dispatch import DISPATCHERS
+from .instrument import Patches, implementation_name, on_allocation
+from .stats import ALLOCATED
+
+# Enough frames to see past copy() and the allocation hooks in instrument.py
+FRAMES = 4
+
+_IGNORED = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+_NOT_SITES = {copy.__file__, instrument.__file__}
+
+
+def _record():
+    return {
+        "calls": 0,
+        "allocated": 0,
+        "peak": 0,
+        "objects": {cls.__name__: 0 for cls in ALLOCATED},
+    }
+
+
+def _kib(n):
+    return "{:.1f} KiB".format(n / 1024)
+
+
+def _sites(before, after, n):
+    """
+    The n lines of code that allocated the most memory between two snapshots.
+    Allocations are attributed to the most recent frame that isn't copying an
+    object so that copies show up where copy() was called.
+    """
+    sizes = defaultdict(int)
+
+    for diff in after.compare_to(before, "traceback"):
+        frames = [f for f in diff.traceback if f.filename not in _NOT_SITES]
+        frame = frames[-1] if frames else diff.traceback[-1]
+        sizes[frame.filename, frame.lineno] += diff.size_diff
+
+    top = sorted(sizes.items(), key=lambda item: -item[1])[:n]
+    return ["{}:{}: {}".format(f, line, _kib(size)) for (f, line), size in top if size > 0]
+
+
+class MemoryProfile:
+    """
+    Measure memory use while active. `operations` maps the name of each
+    operation to its record and `steps` lists a record for each step of any
+    calculation that was run (with its expression as "step" and the top
+    allocation sites as "sites").
+    """
+
+    def __init__(self, sites=3):
+        self.sites = sites
+        self.operations = defaultdict(_record)
+        self.steps = []
+        self._stack = []
+        self._patches = Patches()
+        self._stop_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _update_peaks(self):
+        """Fold the peak since the last update into every active call"""
+        current, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            # Python < 3.9: the peak is only ever the highest since tracing started
+            peak = current
+
+        for frame in self._stack:
+            frame[2] = max(frame[2], peak)
+        return current
+
+    def _enter(self, record):
+        current = self._update_peaks()
+        self._stack.append([record, current, current])
+
+    def _exit(self):
+        current = self._update_peaks()
+        record, start, peak = self._stack.pop()
+        record["calls"] += 1
+
+        # Recursive calls are already included in the outermost call
+        if all(frame[0] is not record for frame in self._stack):
+            record["allocated"] += current - start
+            record["peak"] = max(record["peak"], peak - start)
+
+    def _allocated_one(self, obj):
+        name = type(obj).__name__
+        for record in {id(frame[0]): frame[0] for frame in self._stack}.values():
+            record["objects"][name] += 1
+
+    def _measured(self, func, record):
+        """Wrap func so that each call is added to record()"""
+
+        @wraps(func)
+        def measured(*args, **kwargs):
+            self._enter(record())
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+
+        return measured
+
+    def _step(self, evaluate_step):
+        @wraps(evaluate_step)
+        def step(fingerprint, expr, defined):
+            before = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            record = dict(_record(), step=expr)
+            self.steps.append(record)
+
+            self._enter(record)
+            try:
+                return evaluate_step(fingerprint, expr, defined)
+            finally:
+                self._exit()
+                after = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+                record["sites"] = _sites(before, after, self.sites)
+
+        return step
+
+    def start(self):
+        if self._patches:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(FRAMES)
+            self._stop_tracing = True
+
+        def measured_implementation(dispatcher):
+            def wrap(key, implementation):
+                name = implementation_name(dispatcher, key)
+                return self._measured(implementation, lambda: self.operations[name])
+
+            return wrap
+
+        for dispatcher in DISPATCHERS:
+            self._patches.implementations(dispatcher, measured_implementation(dispatcher))
+
+        for cls in ALLOCATED:
+            on_allocation(self._patches, cls, self._allocated_one)
+
+        # Steps are evaluated using the name of the function in calc_file
+        self._patches.attribute(calc_file, "evaluate_step", self._step(calc_file.evaluate_step))
+
+    def stop(self):
+        if not self._patches:
+            return
+
+        self._patches.undo()
+        if self._stop_tracing:
+            tracemalloc.stop()
+            self._stop_tracing = False
+
+    def report(self, limit=20):
+        """The steps and (at most `limit`) operations with the largest peaks as a table"""
+        lines = []
+
+        def table(title, rows, more=0):
+            header = (title, "calls", "allocated", "peak", "objects")
+            lines.append("{:<40} {:>8} {:>14} {:>14}  {}".format(*header))
+            for name, r in rows:
+                objects = ", ".join("{} {}".format(n, cls) for cls, n in r["objects"].items() if n)
+                lines.append(
+                    "  {:<38} {:>8} {:>14} {:>14}  {}".format(
+                        name, r["calls"], _kib(r["allocated"]), _kib(r["peak"]), objects
+                    )
+                )
+                for site in r.get("sites", []):
+                    lines.append("      {}".format(site))
+            if more > 0:
+                lines.append("  ... {} more".format(more))
+            lines.append("")
+
+        if self.steps:
+            table("step", [(r["step"], r) for r in self.steps])
+
+        ranked = sorted(self.operations.items(), key=lambda item: -item[1]["peak"])
+        table("operation", ranked[:limit], more=len(ranked) - limit)
+
+        return "\n".join(lines)
+
+
+def profile_memory(sites=3):
+    """
+    Profile the memory used by everything evaluated inside a with block,
+    recording the top `sites` allocation sites for each calculation step.
+    """
+    return MemoryProfile(sites)
@@ -0,0 +1,163 @@
+"""
+arpy (Absolute Relativity in Python)
+Copyright (C) 2016-2018 Innes D. Anderson-Morrison All rights reserved.
+
+Rewrites of ar() syntax trees that preserve their value while making them
+cheaper to evaluate. Each pass takes a tree and returns a new one:
+
+    fold_constants   : products, quotients, negations and daggers of Alpha
+                       literals are computed once, at compile time, using the
+                       Cayley table for the current config.
+    build_chains     : runs of full products are collected into a single
+                       Chain node so that the evaluator is free to pick the
+                       bracketing that keeps intermediate results small once
+                       the sizes of the operands are known.
+    share_subtrees   : repeated sub-expressions are hoisted into a Let so that
+                       they are only evaluated once.
+"""
+from collections import Counter
+from dataclasses import fields, replace
+
+from ..algebra.data_types import Alpha
+from .syntax import (
+    LEAVES,
+    AlphaLit,
+    BinOp,
+    Chain,
+    Dagger,
+    Let,
+    Neg,
+    TermLit,
+    Var,
+    children,
+    evaluate,
+)
+
+FOLDABLE_OPS = {"FULL", "BY", "INTO"}
+
+
+def _rebuild(node, transform):
+    """Apply transform to each child of node, returning a new node"""
+    if isinstance(node, LEAVES):
+        return node
+    if isinstance(node, Chain):
+        return replace(node, operands=tuple(transform(o) for o in node.operands))
+    if isinstance(node, Let):
+        bindings = tuple((name, transform(value)) for name, value in node.bindings)
+        return Let(bindings, transform(node.body))
+
+    changes = {
+        f.name: transform(getattr(node, f.name))
+        for f in fields(node)
+        if f.name in ("operand", "lhs", "rhs")
+    }
+    return replace(node, **changes)
+
+
+def _as_literal(value):
+    return AlphaLit(value._index, value._sign) if isinstance(value, Alpha) else None
+
+
+def fold_constants(node, cfg):
+    """Evaluate any sub-tree that only involves Alpha literals"""
+    node = _rebuild(node, lambda n: fold_constants(n, cfg))
+
+    if isinstance(node, Neg) and isinstance(node.operand, (AlphaLit, TermLit)):
+        return replace(node.operand, sign=-node.operand.sign)
+
+    foldable = (isinstance(node, Dagger) and isinstance(node.operand, AlphaLit)) or (
+        isinstance(node, BinOp)
+        and node.op in FOLDABLE_OPS
+        and isinstance(node.lhs, AlphaLit)
+        and isinstance(node.rhs, AlphaLit)
+    )
+
+    if foldable:
+        folded = _as_literal(evaluate(node, [], cfg))
+        if folded is not None:
+            return folded
+
+    # Full products are right associative: x ^ (y ^ z) is (x ^ y) ^ z for Alphas
+    nested = (
+        isinstance(node, BinOp)
+        and node.op == "FULL"
+        and isinstance(node.lhs, AlphaLit)
+        and isinstance(node.rhs, BinOp)
+        and node.rhs.op == "FULL"
+        and isinstance(node.rhs.lhs, AlphaLit)
+    )
+
+    if nested:
+        folded = fold_constants(BinOp("FULL", node.lhs, node.rhs.lhs), cfg)
+        if isinstance(folded, AlphaLit):
+            return BinOp("FULL", folded, node.rhs.rhs)
+
+    return node
+
+
+def _chain_operands(node, operands, written):
+    """Flatten a run of full products, recording how it was bracketed"""
+    if not (isinstance(node, BinOp) and node.op == "FULL"):
+        operands.append(node)
+        return
+
+    i = len(operands)
+    _chain_operands(node.lhs, operands, written)
+    k = len(operands) - 1
+    _chain_operands(node.rhs, operands, written)
+    written.append(((i, len(operands) - 1), k))
+
+
+def build_chains(node):
+    """Replace runs of three or more full products with a Chain"""
+    operands, written = [], []
+    _chain_operands(node, operands, written)
+
+    if len(operands) > 2:
+        return Chain(tuple(build_chains(o) for o in operands), tuple(written))
+
+    return _rebuild(node, build_chains)
+
+
+def share_subtrees(node):
+    """Hoist sub-trees that appear more than once into a Let"""
+    counts = Counter()
+
+    def count(n):
+        counts[n] += 1
+        # Only the first occurrence needs to be walked: the rest are identical
+        if counts[n] == 1:
+            for child in children(n):
+                count(child)
+
+    count(node)
+    shared = {n for n, c in counts.items() if c > 1 and not isinstance(n, LEAVES)}
+
+    if not shared:
+        return node
+
+    names = {}
+    bindings = []
+
+    def hoist(n):
+        if n in names:
+            return Var(names[n])
+
+        rewritten = _rebuild(n, hoist)
+        if n in shared:
+            # Names that can not be produced by the lexer so there are no clashes
+            names[n] = "%{}".format(len(bindings))
+            bindings.append((names[n], rewritten))
+            return Var(names[n])
+
+        return rewritten
+
+    body = hoist(node)
+    return Let(tuple(bindings), body)
+
+
+def optimise(node, cfg):
+    """Run each of the optimisation passes over a syntax tree"""
+    node = fold_constants(node, cfg)
+    node = build_chains(node)
+    return share_subtrees(node)
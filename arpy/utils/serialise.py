@@ -0,0 +1,262 @@
+"""
+Machine readable representations of arpy values.
+
+Records are plain dicts (suitable for JSON) that keep the structure of a
+value rather than its pretty printed form:
+
+    Alpha       : {"type": "Alpha", "index": "012", "sign": -1}
+    Term        : {"type": "Term", "alpha": "012", "sign": -1,
+                   "xis": [{"val": "012", "partials": ["0"]}],
+                   "partials": []}
+    MultiVector : {"type": "MultiVector", "terms": [<term>, ...]}
+
+Anything else is stored as {"type": <class name>, "repr": <str(value)>}.
+
+For large results there is also a compact binary encoding (see `dumps` and
+`loads`). Every alpha index and Xi value that appears is written once to a
+string table and terms then refer to them by position, so a result with
+thousands of terms is a small fraction of the size of its JSON record. The
+layout (all integers little endian) is:
+
+    b"ARPY" version:u8 kind:u8
+    n_strings:u32 (length:u16 utf8)*
+    n_terms:u32 (alpha:u16 sign:i8 n_xis:u8 (val:u16 tex:u16 n:u8 partial:u16*)* n:u8 partial:u16*)*
+
+where kind is one of the KIND_* constants and tex is NO_TEX for Xis without a
+LaTeX value. Other values are written as a single utf8 string. Values that do
+not fit (more than 255 Xis or partials in a term, strings longer than 65535
+bytes or more than MAX_STRINGS distinct strings) raise ValueError.
+"""
+import json
+import struct
+from copy import copy
+
+from ..algebra.data_types import Alpha, MultiVector, Term, Xi
+from ..config import ARConfig
+from ..config import config as cfg
+from .concepts.dispatch import dispatch_on
+
+MAGIC = b"ARPY"
+VERSION = 2
+KIND_OTHER, KIND_ALPHA, KIND_TERM, KIND_MULTIVECTOR = range(4)
+NO_TEX = 0xFFFF
+# Every u16 apart from NO_TEX can refer to a string
+MAX_STRINGS = NO_TEX
+
+
+def config_record(cfg=cfg):
+    """The parameters of a config as a record"""
+    return {
+        "metric": "".join("+" if m == 1 else "-" for m in cfg.metric),
+        "allowed": list(cfg.allowed),
+        "division": cfg.division_type,
+    }
+
+
+def config_from_record(record):
+    """Rebuild a config from the output of `config_record`"""
+    return ARConfig(record["allowed"], record["metric"], record["division"])
+
+
+def _xi_record(xi):
+    record = {"val": xi.val, "partials": [p._index for p in xi.partials]}
+    if xi._tex_val is not None:
+        record["tex"] = xi._tex_val
+    return record
+
+
+def _term_fields(term):
+    return {
+        "alpha": term.index,
+        "sign": term.sign,
+        "xis": [_xi_record(xi) for xi in term._components],
+        "partials": [p._index for p in term.component_partials],
+    }
+
+
+@dispatch_on(index=0)
+def to_record(value):
+    """Convert a value to a JSON compatible record"""
+    return {"type": type(value).__name__, "repr": str(value)}
+
+
+@to_record.add(Alpha)
+def _to_record_alpha(value):
+    return {"type": "Alpha", "index": value._index, "sign": value.sign}
+
+
+@to_record.add(Term)
+def _to_record_term(value):
+    return {"type": "Term", **_term_fields(value)}
+
+
+@to_record.add(MultiVector)
+def _to_record_mvec(value):
+    return {"type": "MultiVector", "terms": [_term_fields(t) for t in value]}
+
+
+def _term_from_fields(fields, cfg):
+    xis = [
+        Xi(x["val"], [Alpha(p, cfg=cfg) for p in x["partials"]], tex=x.get("tex"), cfg=cfg)
+        for x in fields["xis"]
+    ]
+    term = Term(Alpha(fields["alpha"], cfg=cfg), xis, fields["sign"], cfg=cfg)
+    term._component_partials = [Alpha(p, cfg=cfg) for p in fields["partials"]]
+    return term
+
+
+def from_record(record, cfg=cfg):
+    """
+    Rebuild a value from its record. Values that were stored using their
+    repr can not be rebuilt and are returned as the repr string.
+    """
+    kind = record["type"]
+
+    if kind == "Alpha":
+        return Alpha(record["index"], record["sign"], cfg=cfg)
+    if kind == "Term":
+        return _term_from_fields(record, cfg)
+    if kind == "MultiVector":
+        return MultiVector([_term_from_fields(t, cfg) for t in record["terms"]], cfg=cfg)
+
+    return record["repr"]
+
+
+def _terms_of(value):
+    if isinstance(value, MultiVector):
+        return KIND_MULTIVECTOR, list(value)
+    if isinstance(value, Term):
+        return KIND_TERM, [value]
+    if isinstance(value, Alpha):
+        # Term takes the sign from the alpha that it is given
+        return KIND_ALPHA, [Term(copy(value), [])]
+    return KIND_OTHER, None
+
+
+def _count(n, field, limit=0xFF):
+    """Check that a count fits in its field of the binary format"""
+    if n > limit:
+        raise ValueError("Unable to encode {} {}: the limit is {}".format(n, field, limit))
+    return n
+
+
+def dumps(value):
+    """Encode a value using the compact binary format"""
+    kind, terms = _terms_of(value)
+    header = MAGIC + struct.pack("<BB", VERSION, kind)
+
+    if terms is None:
+        text = str(value).encode("utf8")
+        return header + struct.pack("<I", len(text)) + text
+
+    strings = {}
+
+    def ref(s):
+        if s not in strings:
+            _count(len(strings) + 1, "distinct strings", MAX_STRINGS)
+        return strings.setdefault(s, len(strings))
+
+    body = [struct.pack("<I", len(terms))]
+    for t in terms:
+        n_xis = _count(len(t._components), "Xis in a term")
+        body.append(struct.pack("<HbB", ref(t.index), t.sign, n_xis))
+        for xi in t._components:
+            tex = NO_TEX if xi._tex_val is None else ref(xi._tex_val)
+            partials = [ref(p._index) for p in xi.partials]
+            n = _count(len(partials), "partials of a Xi")
+            body.append(struct.pack("<HHB%dH" % n, ref(xi.val), tex, n, *partials))
+        partials = [ref(p._index) for p in t.component_partials]
+        n = _count(len(partials), "partials of a term")
+        body.append(struct.pack("<B%dH" % n, n, *partials))
+
+    table = [struct.pack("<I", len(strings))]
+    for s in strings:
+        encoded = s.encode("utf8")
+        _count(len(encoded), "bytes in a string", 0xFFFF)
+        table.append(struct.pack("<H", len(encoded)) + encoded)
+
+    return b"".join([header] + table + body)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def read(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def read_bytes(self, n):
+        chunk = self.data[self.offset : self.offset + n]
+        self.offset += n
+        return chunk
+
+
+def loads(data, cfg=cfg):
+    """Decode a value written by `dumps`"""
+    reader = _Reader(data)
+    if reader.read_bytes(4) != MAGIC:
+        raise ValueError("Not an arpy binary value")
+
+    version, kind = reader.read("<BB")
+    if version != VERSION:
+        raise ValueError("Unsupported arpy binary version: {}".format(version))
+
+    if kind == KIND_OTHER:
+        (length,) = reader.read("<I")
+        return reader.read_bytes(length).decode("utf8")
+
+    (n_strings,) = reader.read("<I")
+    strings = [reader.read_bytes(reader.read("<H")[0]).decode("utf8") for _ in range(n_strings)]
+
+    def alphas(n):
+        return [Alpha(strings[i], cfg=cfg) for i in reader.read("<%dH" % n)]
+
+    terms = []
+    (n_terms,) = reader.read("<I")
+    for _ in range(n_terms):
+        alpha, sign, n_xis = reader.read("<HbB")
+        xis = []
+        for _ in range(n_xis):
+            val, tex, n_partials = reader.read("<HHB")
+            tex = None if tex == NO_TEX else strings[tex]
+            xis.append(Xi(strings[val], alphas(n_partials), tex=tex, cfg=cfg))
+        term = Term(Alpha(strings[alpha], cfg=cfg), xis, sign, cfg=cfg)
+        term._component_partials = alphas(reader.read("<B")[0])
+        terms.append(term)
+
+    if kind == KIND_ALPHA:
+        return terms[0].alpha
+    if kind == KIND_TERM:
+        return terms[0]
+    return MultiVector(terms, cfg=cfg)
+
+
+def write_frame(stream, header, value):
+    """
+    Write a step of a calculation to a binary stream: a JSON header (which
+    should not contain the value) followed by the value encoded with `dumps`.
+    Each part is prefixed by its length as a u32.
+    """
+    encoded_header = json.dumps(header).encode("utf8")
+    encoded_value = dumps(value)
+    stream.write(struct.pack("<I", len(encoded_header)) + encoded_header)
+    stream.write(struct.pack("<I", len(encoded_value)) + encoded_value)
+
+
+def read_frames(stream, cfg=cfg):
+    """
+    Yield (header, value) for each frame written to a stream by `write_frame`.
+    Values are read using the config in their header if it has one.
+    """
+    while True:
+        size = stream.read(4)
+        if not size:
+            return
+
+        header = json.loads(stream.read(struct.unpack("<I", size)[0]).decode("utf8"))
+        (length,) = struct.unpack("<I", stream.read(4))
+        value_cfg = config_from_record(header["config"]) if "config" in header else cfg
+        yield header, loads(stream.read(length), cfg=value_cfg)
@@ -0,0 +1,191 @@
+"""
+Counters and timers for the operations that make up a calculation.
+
+Collecting stats is opt in and costs nothing while it is turned off: enabling
+them swaps instrumented versions of each function into place and disabling
+them puts the originals back.
+
+    >>> from arpy import stats
+    >>> with stats:
+    ...     ar("Dmu ^ G ^ G!")
+    >>> print(stats.report())
+
+`stats()` returns everything that has been collected since the last reset:
+
+    operations    : calls and (inclusive) seconds for each implementation of
+                    each dispatch_on function, e.g. "full(Term, Term)"
+    product_cache : hits and misses of find_prod's product cache
+    allocated     : the number of Alphas, Xis, Terms and MultiVectors created
+    context       : calls and seconds spent by ARContexts parsing and
+                    evaluating expressions
+    expressions   : calls and evaluation seconds for each expression
+
+Only the current process is measured: steps run by worker processes (when
+using `jobs` or `aeval`) are not included.
+"""
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from ..algebra.data_types import Alpha, MultiVector, Term, Xi
+from ..algebra.operations import find_prod
+from .concepts.dispatch import DISPATCHERS
+from .instrument import Patches, implementation_name, on_allocation
+from .lexparse import ARContext
+
+ALLOCATED = [Alpha, Xi, Term, MultiVector]
+
+# The expression most recently compiled by the current thread (or task)
+_expression = ContextVar("arpy_stats_expression", default=None)
+
+
+def _timer():
+    return {"calls": 0, "seconds": 0.0}
+
+
+class _CountingCache(dict):
+    """A product cache that counts successful and failed lookups"""
+
+    def __init__(self, contents, stats):
+        super().__init__(contents)
+        self.stats = stats
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        self.stats._product_cache["hits" if value else "misses"] += 1
+        return value
+
+
+class Stats:
+    """
+    Call to get the stats collected so far. Use enable/disable (or use the
+    object as a context manager) to control when stats are collected.
+    """
+
+    def __init__(self):
+        self._patches = Patches()
+        self.reset()
+
+    def __repr__(self):
+        return "<Stats: {}>".format("enabled" if self.enabled else "disabled")
+
+    def __call__(self):
+        return {
+            "operations": {name: dict(t) for name, t in self._operations.items()},
+            "product_cache": dict(self._product_cache),
+            "allocated": dict(self._allocated),
+            "context": {name: dict(t) for name, t in self._context.items()},
+            "expressions": {text: dict(t) for text, t in self._expressions.items()},
+        }
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    @property
+    def enabled(self):
+        return bool(self._patches)
+
+    def reset(self):
+        """Discard everything collected so far"""
+        self._operations = defaultdict(_timer)
+        self._product_cache = {"hits": 0, "misses": 0}
+        self._allocated = {cls.__name__: 0 for cls in ALLOCATED}
+        self._context = {"parse": _timer(), "evaluate": _timer()}
+        self._expressions = defaultdict(_timer)
+
+    def _timed(self, func, timers):
+        """Wrap func so that each call is added to every timer in timers()"""
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                for t in timers():
+                    t["calls"] += 1
+                    t["seconds"] += seconds
+
+        return timed
+
+    def _allocated_one(self, obj):
+        self._allocated[type(obj).__name__] += 1
+
+    def enable(self):
+        """Start collecting stats"""
+        if self.enabled:
+            return
+
+        patches = self._patches
+
+        def timed_implementation(dispatcher):
+            def wrap(key, implementation):
+                name = implementation_name(dispatcher, key)
+                return self._timed(implementation, lambda: [self._operations[name]])
+
+            return wrap
+
+        for dispatcher in DISPATCHERS:
+            patches.implementations(dispatcher, timed_implementation(dispatcher))
+
+        for cls in ALLOCATED:
+            on_allocation(patches, cls, self._allocated_one)
+
+        # Evaluation is timed against the expression that was compiled last
+        timed_compile = self._timed(ARContext.compile, lambda: [self._context["parse"]])
+
+        @wraps(ARContext.compile)
+        def compile(context, text):
+            _expression.set(text)
+            return timed_compile(context, text)
+
+        def evaluation_timers():
+            return [self._context["evaluate"], self._expressions[_expression.get()]]
+
+        patches.attribute(ARContext, "compile", compile)
+        patches.attribute(ARContext, "_run", self._timed(ARContext._run, evaluation_timers))
+        find_prod.set_cache(_CountingCache(find_prod.cache, self))
+
+    def disable(self):
+        """Stop collecting stats (keeping what has been collected so far)"""
+        if not self.enabled:
+            return
+
+        self._patches.undo()
+        find_prod.set_cache(dict(find_prod.cache))
+
+    def report(self, limit=20):
+        """The stats collected so far as a table, listing at most `limit` operations"""
+        stats = self()
+        lines = []
+
+        def timers(title, items):
+            lines.append("{:<48} {:>10} {:>12}".format(title, "calls", "seconds"))
+            ranked = sorted(items.items(), key=lambda item: -item[1]["seconds"])
+            for name, t in ranked[:limit]:
+                lines.append("  {:<46} {:>10} {:>12.6f}".format(name, t["calls"], t["seconds"]))
+            if len(ranked) > limit:
+                lines.append("  ... {} more".format(len(ranked) - limit))
+            lines.append("")
+
+        timers("operation", stats["operations"])
+        timers("context", stats["context"])
+        timers("expression", stats["expressions"])
+
+        cache = stats["product_cache"]
+        lines.append("product cache: {hits} hits, {misses} misses".format(**cache))
+        lines.append(
+            "allocated: "
+            + ", ".join("{} {}".format(n, name) for name, n in stats["allocated"].items())
+        )
+
+        return "\n".join(lines)
+
+
+stats = Stats()
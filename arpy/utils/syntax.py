@@ -0,0 +1,325 @@
+"""
+arpy (Absolute Relativity in Python)
+Copyright (C) 2016-2018 Innes D. Anderson-Morrison All rights reserved.
+
+The abstract syntax tree for ar() expressions along with the standard
+evaluator. Nodes are immutable (and hashable) so that a parsed expression
+can be cached, shared between threads and walked by alternative evaluators.
+New evaluators follow the same pattern as `evaluate`: a dispatch_on function
+with an implementation for each node type.
+"""
+from dataclasses import dataclass, fields
+from typing import Tuple, Union
+
+from ..algebra.data_types import Alpha, MultiVector, Term
+from ..algebra.differential import AR_differential, CompoundDifferential
+from ..algebra.operations import (
+    commutator,
+    dagger,
+    div_by,
+    div_into,
+    full,
+    project,
+    projected_full,
+)
+from .concepts.dispatch import dispatch_on
+
+
+class AR_Error(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class AlphaLit:
+    """a12, -a0"""
+
+    index: str
+    sign: int = 1
+
+
+@dataclass(frozen=True)
+class TermLit:
+    """p12, -p0"""
+
+    index: str
+    sign: int = 1
+
+
+@dataclass(frozen=True)
+class MVecLit:
+    """{0 1 2 3}"""
+
+    alphas: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class DiffLit:
+    """<0 1 2 3>"""
+
+    alphas: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class Var:
+    """A name bound in the context or the calling scope"""
+
+    name: str
+
+
+@dataclass(frozen=True)
+class Neg:
+    """-x"""
+
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class Dagger:
+    """x!"""
+
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class Project:
+    """<x>n"""
+
+    operand: "Node"
+    grade: int
+
+
+@dataclass(frozen=True)
+class Commutator:
+    """[x, y]"""
+
+    lhs: "Node"
+    rhs: "Node"
+
+
+@dataclass(frozen=True)
+class BinOp:
+    """
+    x ^ y, x / y, x \\ y, x + y, x - y
+    Juxtaposition (x y) is parsed as the full product.
+    """
+
+    op: str
+    lhs: "Node"
+    rhs: "Node"
+
+
+@dataclass(frozen=True)
+class Chain:
+    """
+    x ^ y ^ z: a run of full products that may be evaluated in any order.
+    `written` is the bracketing as written, in the same form as the result of
+    chain_order, for chains containing a differential (which must be
+    evaluated as written). Produced by the optimiser rather than the parser.
+    """
+
+    operands: Tuple["Node", ...]
+    written: Tuple[Tuple[Tuple[int, int], int], ...]
+
+
+@dataclass(frozen=True)
+class Let:
+    """
+    Evaluate each binding once, in order, and then evaluate body with the
+    bound names in scope. Produced by the optimiser rather than the parser.
+    """
+
+    bindings: Tuple[Tuple[str, "Node"], ...]
+    body: "Node"
+
+
+Node = Union[
+    AlphaLit, TermLit, MVecLit, DiffLit, Var, Neg, Dagger, Project, Commutator, BinOp, Chain, Let
+]
+
+
+LEAVES = (AlphaLit, TermLit, MVecLit, DiffLit, Var)
+
+
+def children(node):
+    """The immediate sub-trees of a node"""
+    if isinstance(node, LEAVES):
+        return []
+    if isinstance(node, Chain):
+        return list(node.operands)
+    if isinstance(node, Let):
+        return [value for _, value in node.bindings] + [node.body]
+
+    return [getattr(node, f.name) for f in fields(node) if f.name in ("operand", "lhs", "rhs")]
+
+
+def free_variables(node):
+    """The names that must be bound in order to evaluate a tree"""
+    if isinstance(node, Var):
+        return {node.name}
+    if isinstance(node, Let):
+        bound = {name for name, _ in node.bindings}
+        return set().union(*(free_variables(c) for c in children(node))) - bound
+
+    return set().union(*(free_variables(c) for c in children(node)))
+
+
+def lookup(name, scopes):
+    """Find the first binding of name in a list of scopes (dicts)"""
+    for scope in scopes:
+        if name in scope:
+            return scope[name]
+
+    raise AR_Error('"{}" is not currently defined'.format(name))
+
+
+@dispatch_on(index=0)
+def evaluate(node, scopes, cfg):
+    """
+    Evaluate an expression tree using the given config, resolving variables
+    by searching each of `scopes` in turn.
+    """
+    raise AR_Error("Unable to evaluate {}".format(node))
+
+
+@evaluate.add(AlphaLit)
+def _evaluate_alpha(node, scopes, cfg):
+    return Alpha(node.index, node.sign, cfg=cfg)
+
+
+@evaluate.add(TermLit)
+def _evaluate_term(node, scopes, cfg):
+    return Term(Alpha(node.index, node.sign, cfg=cfg), cfg=cfg)
+
+
+@evaluate.add(MVecLit)
+def _evaluate_mvec(node, scopes, cfg):
+    return MultiVector(list(node.alphas), cfg=cfg)
+
+
+@evaluate.add(DiffLit)
+def _evaluate_diff(node, scopes, cfg):
+    return AR_differential(list(node.alphas), cfg=cfg)
+
+
+@evaluate.add(Var)
+def _evaluate_var(node, scopes, cfg):
+    return lookup(node.name, scopes)
+
+
+@evaluate.add(Neg)
+def _evaluate_neg(node, scopes, cfg):
+    return -evaluate(node.operand, scopes, cfg)
+
+
+@evaluate.add(Dagger)
+def _evaluate_dagger(node, scopes, cfg):
+    return dagger(evaluate(node.operand, scopes, cfg), cfg=cfg)
+
+
+@evaluate.add(Project)
+def _evaluate_project(node, scopes, cfg):
+    operand = node.operand
+    if isinstance(operand, BinOp) and operand.op == "FULL":
+        # Push the projection down into the product
+        lhs = evaluate(operand.lhs, scopes, cfg)
+        rhs = evaluate(operand.rhs, scopes, cfg)
+        return projected_full(lhs, rhs, node.grade, cfg=cfg)
+
+    if isinstance(operand, Chain):
+        # Only the final product needs to be projected
+        values = [evaluate(o, scopes, cfg) for o in operand.operands]
+        split = chain_order(values) or dict(operand.written)
+        k = split[(0, len(values) - 1)]
+        lhs = _chain_product(values, split, 0, k, cfg)
+        rhs = _chain_product(values, split, k + 1, len(values) - 1, cfg)
+        return projected_full(lhs, rhs, node.grade, cfg=cfg)
+
+    return project(evaluate(operand, scopes, cfg), node.grade, cfg=cfg)
+
+
+@evaluate.add(Commutator)
+def _evaluate_commutator(node, scopes, cfg):
+    lhs = evaluate(node.lhs, scopes, cfg)
+    rhs = evaluate(node.rhs, scopes, cfg)
+    return commutator(lhs, rhs, cfg=cfg)
+
+
+BINOPS = {
+    "FULL": lambda a, b, cfg: full(a, b, cfg=cfg),
+    "BY": lambda a, b, cfg: div_by(a, b, cfg=cfg),
+    "INTO": lambda a, b, cfg: div_into(a, b, cfg=cfg),
+    "PLUS": lambda a, b, cfg: a + b,
+    "MINUS": lambda a, b, cfg: a - b,
+}
+
+
+@evaluate.add(BinOp)
+def _evaluate_binop(node, scopes, cfg):
+    lhs = evaluate(node.lhs, scopes, cfg)
+    rhs = evaluate(node.rhs, scopes, cfg)
+    return BINOPS[node.op](lhs, rhs, cfg)
+
+
+def _size(value):
+    """The number of terms carried by an operand of the full product"""
+    return len(value) if isinstance(value, MultiVector) else 1
+
+
+def chain_order(values):
+    """
+    Find the cheapest way to bracket a chain of full products in the same way
+    as the classic matrix-chain ordering problem: multiplying operands with
+    n and m terms costs (and produces) n*m terms. Returns a mapping of
+    (i, j) -> k meaning that operands i..j should be split after k, or None
+    if the chain contains a differential and must be evaluated as written.
+    """
+    if any(isinstance(v, (AR_differential, CompoundDifferential)) for v in values):
+        return None
+
+    n = len(values)
+    sizes = [_size(v) for v in values]
+    spans = {(i, i): sizes[i] for i in range(n)}
+    costs = {(i, i): 0 for i in range(n)}
+    split = {}
+
+    for length in range(2, n + 1):
+        for i in range(n - length + 1):
+            j = i + length - 1
+            spans[(i, j)] = spans[(i, j - 1)] * sizes[j]
+            best = None
+            for k in reversed(range(i, j)):
+                cost = costs[(i, k)] + costs[(k + 1, j)] + spans[(i, j)]
+                # Ties are broken towards the left-to-right order as written
+                if best is None or cost < best:
+                    best, split[(i, j)] = cost, k
+            costs[(i, j)] = best
+
+    return split
+
+
+def _chain_product(values, split, i, j, cfg):
+    if i == j:
+        return values[i]
+
+    k = split[(i, j)]
+    lhs = _chain_product(values, split, i, k, cfg)
+    rhs = _chain_product(values, split, k + 1, j, cfg)
+    return full(lhs, rhs, cfg=cfg)
+
+
+@evaluate.add(Chain)
+def _evaluate_chain(node, scopes, cfg):
+    values = [evaluate(o, scopes, cfg) for o in node.operands]
+    split = chain_order(values) or dict(node.written)
+    return _chain_product(values, split, 0, len(values) - 1, cfg)
+
+
+@evaluate.add(Let)
+def _evaluate_let(node, scopes, cfg):
+    bound = {}
+    scopes = [bound] + list(scopes)
+
+    for name, value in node.bindings:
+        bound[name] = evaluate(value, scopes, cfg)
+
+    return evaluate(node.body, scopes, cfg)
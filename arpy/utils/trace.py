@@ -0,0 +1,186 @@
+"""
+Record where the time goes inside a calculation as Chrome trace events.
+
+    >>> from arpy import ar, trace
+    >>> with trace("out.json"):
+    ...     ar("Dmu ^ G ^ G!")
+
+Open the file in chrome://tracing or https://ui.perfetto.dev to see a nested
+span for each of:
+
+    step         : a step of a .arp calculation file
+    expression   : each expression evaluated by an ARContext
+    node         : the evaluation of each node of an expression's syntax tree
+    differential : each application of a differential operator
+
+Each span records the number of terms in its result (and the number of terms
+it was given for differentials). As with arpy.stats, tracing swaps
+instrumented functions into place while it is active so it costs nothing the
+rest of the time. Only the current process is traced.
+"""
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from ..algebra.data_types import MultiVector, Term
+from ..algebra.differential import AR_differential, CompoundDifferential
+from . import calc_file
+from .instrument import Patches
+from .lexparse import ARContext
+from .syntax import BinOp, Chain, Project, Var, evaluate
+
+# The expression most recently compiled by the current thread (or task)
+_expression = ContextVar("arpy_trace_expression", default=None)
+
+
+def _terms(value):
+    """The number of terms in a value (None for values that are not terms)"""
+    if isinstance(value, MultiVector):
+        return len(value)
+    if isinstance(value, Term):
+        return 1
+    return None
+
+
+def _node_name(node):
+    name = type(node).__name__
+    if isinstance(node, BinOp):
+        return "{} {}".format(name, node.op)
+    if isinstance(node, Var):
+        return "{} {}".format(name, node.name)
+    if isinstance(node, Project):
+        return "{} {}".format(name, node.grade)
+    if isinstance(node, Chain):
+        return "{} ({} operands)".format(name, len(node.operands))
+    return name
+
+
+class Trace:
+    """
+    Collect trace events while active, writing them to `path` (if given) when
+    the trace stops. The events are also available as `events`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.events = []
+        self._patches = Patches()
+        self._start = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _span(self, func, category, describe):
+        """
+        Wrap func so that each call is recorded as a span. describe(args,
+        result) gives the name and args of the span.
+        """
+
+        @wraps(func)
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                end = time.perf_counter()
+                name, span_args = describe(args, result)
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": category,
+                        "ph": "X",
+                        "ts": (start - self._start) * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": span_args,
+                    }
+                )
+
+        return traced
+
+    def start(self):
+        if self._patches:
+            return
+
+        self._start = time.perf_counter()
+        patches = self._patches
+
+        # Steps are evaluated using the name of the function in calc_file
+        patches.attribute(
+            calc_file,
+            "evaluate_step",
+            self._span(
+                calc_file.evaluate_step,
+                "step",
+                lambda args, result: (args[1], {"terms": _terms(result and result[0])}),
+            ),
+        )
+
+        compile = ARContext.compile
+
+        @wraps(compile)
+        def remember_expression(context, text):
+            _expression.set(text)
+            return compile(context, text)
+
+        patches.attribute(ARContext, "compile", remember_expression)
+        patches.attribute(
+            ARContext,
+            "_run",
+            self._span(
+                ARContext._run,
+                "expression",
+                lambda args, result: (_expression.get(), {"terms": _terms(result)}),
+            ),
+        )
+
+        patches.implementations(
+            evaluate,
+            lambda key, implementation: self._span(
+                implementation,
+                "node",
+                lambda args, result: (_node_name(args[0]), {"terms": _terms(result)}),
+            ),
+        )
+
+        for cls in [AR_differential, CompoundDifferential]:
+            patches.attribute(
+                cls,
+                "__call__",
+                self._span(
+                    cls.__call__,
+                    "differential",
+                    lambda args, result: (
+                        repr(args[0]),
+                        {"input_terms": _terms(args[1]), "terms": _terms(result)},
+                    ),
+                ),
+            )
+
+    def stop(self):
+        if not self._patches:
+            return
+
+        self._patches.undo()
+        if self.path is not None:
+            self.write(self.path)
+
+    def write(self, path):
+        """Write the events collected so far in Chrome's trace event format"""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+def trace(path=None):
+    """Trace everything evaluated inside a with block, writing the events to `path`"""
+    return Trace(path)
@@ -0,0 +1,76 @@
+"""
+How long it takes to start using arpy in a fresh interpreter.
+
+Each measurement runs in a new process so that nothing is already imported:
+
+    import      : `import arpy`
+    predefined  : `import arpy` and then using one of the predefined values
+    ar          : `import arpy` and then evaluating an expression with `ar`
+    cli         : importing what the CLI needs to run a calculation file
+
+Only the time taken by the code itself is measured, not the time taken to
+start the interpreter. Run from the root of the repository:
+
+    $ python benchmarks/import_time.py -n 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import": "import arpy",
+    "predefined": "import arpy; arpy.G",
+    "ar": "import arpy; arpy.ar('F ^ F!')",
+    "cli": "import arpy.utils.calc_file",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code, repeats):
+    """The time taken to run code in repeats fresh interpreters"""
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", TIMER.format(code)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        times.append(float(output.stdout))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--repeats", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        times = measure(code, args.repeats)
+        results[name] = {"min": min(times), "median": statistics.median(times)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("{:<12} {:>10} {:>10}".format("scenario", "min (ms)", "median (ms)"))
+    for name, r in results.items():
+        print("{:<12} {:>10.1f} {:>10.1f}".format(name, r["min"] * 1000, r["median"] * 1000))
+
+
+if __name__ == "__main__":
+    main()
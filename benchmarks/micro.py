@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks for the algebra core.
+
+Each case is a function that does any setup that should not be timed and
+returns a function of no arguments to time. Cases are registered with the
+`case` decorator and run using run.py.
+"""
+from copy import copy
+
+from arpy import (
+    DG,
+    Alpha,
+    ARContext,
+    Dmu,
+    F,
+    G,
+    Term,
+    config,
+    dual,
+    find_prod,
+    full,
+    hermitian,
+    rev,
+)
+from arpy.reductions.del_grouping import del_grouped_terms
+
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def _all_products():
+    alphas = [Alpha(a) for a in config.allowed]
+    for i in alphas:
+        for j in alphas:
+            find_prod(i, j)
+
+
+@case("find_prod/cold")
+def find_prod_cold():
+    def run():
+        find_prod.cache.clear()
+        _all_products()
+
+    return run
+
+
+@case("find_prod/warm")
+def find_prod_warm():
+    _all_products()
+    return _all_products
+
+
+@case("full/alpha-alpha")
+def full_alpha_alpha():
+    a, b = Alpha("12"), Alpha("023")
+    return lambda: full(a, b)
+
+
+@case("full/alpha-term")
+def full_alpha_term():
+    a, t = Alpha("12"), Term("023")
+    return lambda: full(a, t)
+
+
+@case("full/term-term")
+def full_term_term():
+    s, t = Term("12"), Term("023")
+    return lambda: full(s, t)
+
+
+@case("full/mvec-mvec")
+def full_mvec_mvec():
+    return lambda: full(F, F)
+
+
+@case("full/G^G")
+def full_G_G():
+    return lambda: full(G, G)
+
+
+@case("differential/Dmu^G")
+def differential_Dmu_G():
+    return lambda: Dmu(G)
+
+
+@case("differential/DG^G")
+def differential_DG_G():
+    return lambda: DG(G)
+
+
+@case("cancel_terms/G^G^G")
+def cancel_terms_large():
+    product = full(G, full(G, G))
+    return lambda: copy(product).cancel_terms()
+
+
+@case("hermitian/G")
+def hermitian_G():
+    return lambda: hermitian(G)
+
+
+@case("rev/G")
+def rev_G():
+    return lambda: rev(G)
+
+
+@case("dual/G")
+def dual_G():
+    return lambda: dual(G)
+
+
+@case("ar/parse")
+def ar_parse():
+    ctx = ARContext(cfg=config)
+    expressions = [
+        "a12 ^ a23",
+        "F ^ F!",
+        "Dmu ^ (F + a0)",
+        "-<G ^ G>2 / a0123",
+        "[a1, a2] + a0 \\ {0 1 2 3}",
+        "A ^ B ^ T ^ E ^ G",
+    ]
+
+    def run():
+        ctx._compiled.clear()
+        for expression in expressions:
+            ctx.compile(expression)
+
+    return run
+
+
+@case("del_grouped_terms/DG^G")
+def del_grouped_terms_DG_G():
+    result = DG(G)
+    return lambda: del_grouped_terms(result)
@@ -0,0 +1,170 @@
+"""
+Run the arpy benchmarks, optionally comparing against a saved baseline.
+
+    $ python benchmarks/run.py --output baseline.json
+    $ python benchmarks/run.py --compare baseline.json --threshold 0.2
+
+Each case is timed by calling it enough times to take at least `--min-time`
+seconds and then repeating that `--repeat` times. The fastest repeat is used
+for comparisons as it is the least affected by anything else running on the
+machine. Suites that define a `profile` function (see scenarios.py) also
+record the peak memory and the time spent in each phase of their cases. When
+comparing, any case that is slower than the baseline (or uses more memory) by
+more than the threshold (a fraction: 0.2 is 20%) is reported as a regression
+and the exit status is 1.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import arpy  # noqa: E402
+
+SUITES = ["micro", "scenarios"]
+MIB = 1024 * 1024
+
+
+def load_cases(suites):
+    """
+    Map the name of each case (prefixed by its suite) to its setup function and
+    the profile function for its suite (None if there isn't one)
+    """
+    cases = {}
+    for suite in suites:
+        module = __import__(suite)
+        profile = getattr(module, "profile", None)
+        for name, setup in module.CASES.items():
+            cases["{}:{}".format(suite, name)] = (setup, profile)
+    return cases
+
+
+def time_case(setup, repeat, min_time):
+    """Time a case, returning the time per call (in seconds) for each repeat"""
+    func = setup()
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+
+    return times, number
+
+
+def run(cases, repeat, min_time):
+    results = {}
+    for name, (setup, profile) in cases.items():
+        times, number = time_case(setup, repeat, min_time)
+        results[name] = {"min": min(times), "median": statistics.median(times), "number": number}
+        print(
+            "{:<40} {:>12.1f} us {:>12.1f} us".format(
+                name, results[name]["min"] * 1e6, results[name]["median"] * 1e6
+            ),
+            file=sys.stderr,
+        )
+
+        if profile is not None:
+            results[name].update(profile(setup))
+            phases = "  ".join(
+                "{} {:.1f} ms".format(phase, seconds * 1e3)
+                for phase, seconds in sorted(results[name]["phases"].items())
+            )
+            print(
+                "    peak {:.1f} MiB  {}".format(results[name]["peak_memory"] / MIB, phases),
+                file=sys.stderr,
+            )
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change in each case from the baseline, returning the regressions"""
+    regressions = []
+    print("\n{:<40} {:>12} {:>12} {:>8}".format("case", "baseline", "current", "change"))
+
+    for name, result in results.items():
+        if name not in baseline:
+            print("{:<40} {:>12} {:>12.1f} {:>8}".format(name, "-", result["min"] * 1e6, "new"))
+            continue
+
+        before = baseline[name]["min"]
+        change = result["min"] / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+
+        print(
+            "{:<40} {:>12.1f} {:>12.1f} {:>+7.0%}{}".format(
+                name, before * 1e6, result["min"] * 1e6, change, flag
+            )
+        )
+
+        if "peak_memory" in result and "peak_memory" in baseline[name]:
+            before = baseline[name]["peak_memory"]
+            change = result["peak_memory"] / before - 1
+            flag = ""
+            if change > threshold:
+                regressions.append(name)
+                flag = "  REGRESSION"
+
+            print(
+                "{:<40} {:>9.1f} MiB {:>8.1f} MiB {:>+7.0%}{}".format(
+                    "  peak memory", before / MIB, result["peak_memory"] / MIB, change, flag
+                )
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", "--filter", default="*", help="only run cases matching this glob")
+    parser.add_argument("--suite", action="append", help="the suites to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    cases = load_cases(args.suite or SUITES)
+    cases = {name: case for name, case in cases.items() if fnmatch.fnmatch(name, args.filter)}
+    results = run(cases, args.repeat, args.min_time)
+
+    if args.output:
+        meta = {
+            "arpy": arpy.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+End to end scenarios: the workloads in examples/ that we run for real.
+
+As with the micro-benchmarks, each scenario does its setup and returns a
+function of no arguments that runs the workload (discarding its output) so
+that run.py can time it. run.py then calls `profile` which runs the scenario
+twice more: once to split its run time into phases and once under tracemalloc
+to find its peak memory use. The phases are:
+
+    context       : constructing ARContexts
+    products      : full and projected products, division and commutators
+    differentials : applying differential operators
+    formatting    : converting results to text
+    other         : everything else (parsing, the example's own logic...)
+
+Time is attributed to the innermost phase that is running so the phases add
+up to the total. Caches are warm after the first repeat so the scenarios
+measure the work done by the algebra rather than the one-off cost of building
+Cayley tables: import_time and micro:find_prod/cold cover that.
+"""
+import io
+import os
+import runpy
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import redirect_stdout
+from functools import wraps
+
+from arpy import AR_differential, ARContext, CompoundDifferential
+from arpy.algebra import operations
+from arpy.algebra.data_types import Alpha, MultiVector, Term, Xi
+from arpy.utils import calc_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, "examples")
+DATA = os.path.join(ROOT, "benchmarks", "data")
+
+# Checking every redundant candidate takes several minutes so only every Nth
+# one is checked. N is prime so that the sample covers every metric and
+# division type.
+REDUNDANT_STRIDE = 107
+
+PHASES = {
+    "context": [(ARContext, "__init__")],
+    "products": [
+        (operations, name)
+        for name in ["full", "projected_full", "div_by", "div_into", "commutator"]
+    ],
+    "differentials": [(AR_differential, "__call__"), (CompoundDifferential, "__call__")],
+    "formatting": [
+        (cls, name)
+        for cls in [Alpha, Xi, Term, MultiVector, AR_differential, CompoundDifferential]
+        for name in ["__repr__", "__str__", "__tex__"]
+        if name in vars(cls)
+    ]
+    + [(calc_file.Calculation, "format"), (calc_file, "side_by_side")],
+}
+
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def _quietly(func):
+    def run():
+        with redirect_stdout(io.StringIO()):
+            func()
+
+    return run
+
+
+def _maxwell(include_redundant, allow_neg_B, stride=1):
+    example = runpy.run_path(os.path.join(EXAMPLES, "check_consistency_with_maxwell.py"))
+    candidates = example["all_candidates"](include_redundant)[::stride]
+
+    def run():
+        for candidate in candidates:
+            example["check_candidate"](candidate, allow_neg_B)
+
+    return _quietly(run)
+
+
+@case("maxwell")
+def maxwell():
+    return _maxwell(include_redundant=False, allow_neg_B=False)
+
+
+@case("maxwell/redundant-neg-B")
+def maxwell_redundant_neg_B():
+    return _maxwell(include_redundant=True, allow_neg_B=True, stride=REDUNDANT_STRIDE)
+
+
+@case("comp-metric")
+def comp_metric():
+    # The example does all of its work when it is run
+    path = os.path.join(EXAMPLES, "comp-metric.py")
+    return _quietly(lambda: runpy.run_path(path))
+
+
+@case("calc-file/large")
+def calc_file_large():
+    with open(os.path.join(DATA, "large.arp")) as f:
+        script = f.read().split("\n")
+
+    def run():
+        for _ in calc_file.run_script(script):
+            pass
+
+    return run
+
+
+class _PhaseTimer:
+    """Accumulate the time spent in each phase while its functions are patched in"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._stack = ["other"]
+        self._since = time.perf_counter()
+
+    def _switch(self, phase=None):
+        now = time.perf_counter()
+        self.seconds[self._stack[-1]] += now - self._since
+        self._since = now
+        if phase is None:
+            self._stack.pop()
+        else:
+            self._stack.append(phase)
+
+    def wrap(self, phase, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            self._switch(phase)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._switch()
+
+        return timed
+
+    def patch(self):
+        """Replace each of the functions in PHASES, returning how to undo it"""
+        patched = []
+
+        for phase, targets in PHASES.items():
+            for owner, name in targets:
+                original = getattr(owner, name)
+                timed = self.wrap(phase, original)
+
+                if isinstance(owner, type):
+                    owners = [owner]
+                else:
+                    # Functions are imported by name so replace every reference
+                    owners = [
+                        m
+                        for name_, m in list(sys.modules.items())
+                        if name_.split(".")[0] == "arpy" and getattr(m, name, None) is original
+                    ]
+
+                for o in owners:
+                    setattr(o, name, timed)
+                    patched.append((o, name, original))
+
+        return patched
+
+    def finish(self):
+        self._switch("other")
+        return dict(self.seconds)
+
+
+def phases(setup):
+    """Run a scenario, returning the seconds spent in each phase"""
+    func = setup()
+    timer = _PhaseTimer()
+    patched = timer.patch()
+    try:
+        func()
+    finally:
+        for owner, name, original in reversed(patched):
+            setattr(owner, name, original)
+
+    return timer.finish()
+
+
+def peak_memory(setup):
+    """Run a scenario, returning the peak memory (in bytes) that it allocated"""
+    func = setup()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def profile(setup):
+    return {"peak_memory": peak_memory(setup), "phases": phases(setup)}